@@ -34,15 +34,47 @@ class Config:
 
     # CALCULATION LIMITS
     # max matrix size
-    MAX_MATRIX = int(os.getenv("MAX_MATRIX", 8))
+    MAX_MATRIX = int(os.getenv("MAX_MATRIX", 100))
+    # kernels for float matrices: auto, numpy or python
+    MATRIX_BACKEND = os.getenv("MATRIX_BACKEND", "auto")
+    # matrices greater than this size are multiplied by Strassen algorithm (see matrix_benchmark.py)
+    STRASSEN_THRESHOLD = int(os.getenv("STRASSEN_THRESHOLD", 96))
+    # max estimated cost of /m_pow in elementary operations (depends on matrix size, elements and exponent)
+    MATRIX_POW_LIMIT = int(os.getenv("MATRIX_POW_LIMIT", 2 * 10 ** 7))
+    # max estimated length of elements of exact /m_pow result in bits (about 3000 digits)
+    MATRIX_POW_BITS = int(os.getenv("MATRIX_POW_BITS", 10000))
+    # seconds for /eigen calculation
+    EIGEN_TIME_LIMIT = float(os.getenv("EIGEN_TIME_LIMIT", 3))
+    # seconds for /charpoly calculation
+    CHARPOLY_TIME_LIMIT = float(os.getenv("CHARPOLY_TIME_LIMIT", 3))
+    # matrices with greater share of zero elements are stored sparse
+    SPARSE_THRESHOLD = float(os.getenv("SPARSE_THRESHOLD", 0.7))
+    # memory for cached /det, /ref and /m_inverse results in bytes (0 disables cache)
+    MATRIX_CACHE_SIZE = int(os.getenv("MATRIX_CACHE_SIZE", 32 * 2 ** 20))
     # max variables count in logic expression
     MAX_VARS = int(os.getenv("MAX_VARS", 7))
     # max rings modulo
     MAX_MODULO = int(os.getenv("MAX_MODULO", 10**15))
     # max elements to list in message
     MAX_ELEMENTS = int(os.getenv("MAX_ELEMENTS", 101))
+    # max count of baby steps in memory for /dlog
+    DLOG_TABLE_SIZE = int(os.getenv("DLOG_TABLE_SIZE", 2 ** 20))
+    # seconds for /dlog calculation
+    DLOG_TIME_LIMIT = float(os.getenv("DLOG_TIME_LIMIT", 3))
+    # max count of elements in one /inverse message
+    INVERSE_BATCH_MAX = int(os.getenv("INVERSE_BATCH_MAX", 1000))
+    # max degree of /poly polynomials
+    POLY_MAX_DEGREE = int(os.getenv("POLY_MAX_DEGREE", 2000))
     # max number that can be factorized
-    FACTORIZE_MAX = int(os.getenv("FACTORIZE_MAX", 10 ** 12))
+    FACTORIZE_MAX = int(os.getenv("FACTORIZE_MAX", 10 ** 30))
+    # seconds for /factorize calculation
+    FACTORIZE_TIME_LIMIT = float(os.getenv("FACTORIZE_TIME_LIMIT", 3))
+    # max count of numbers in /factorize a..b
+    FACTORIZE_RANGE = int(os.getenv("FACTORIZE_RANGE", 1000))
+    # numbers below this limit are factorized by table of smallest prime factors (0 disables table)
+    SPF_TABLE_LIMIT = int(os.getenv("SPF_TABLE_LIMIT", 10 ** 8))
+    # file for table of smallest prime factors, it is built at the first use
+    SPF_TABLE_PATH = os.getenv("SPF_TABLE_PATH", "spf.bin")
 
     # /calc line limit
     CALC_LINE_LIMIT = int(os.getenv("CALC_LINE_LIMIT", 1000))
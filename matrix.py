@@ -17,10 +17,28 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import Tuple, List, Union
-from functools import lru_cache
+from typing import Tuple, List, Dict, Union, Optional, Iterable, Callable, Sequence
+from functools import reduce
 from fractions import Fraction
-import hashlib
+from itertools import chain
+from math import lcm, gcd, isqrt, prod, sqrt, copysign, isfinite, log2
+from array import array
+from collections import OrderedDict
+from operator import xor
+from weakref import WeakValueDictionary
+from io import StringIO
+import sys
+import threading
+import time
+
+try:
+    import numpy
+except ImportError:  # pure Python kernels are used
+    numpy = None
+
+from config import Config
+from shunting_yard import CalculationLimitError
+from rings import ext_gcd, find_inverse, solve_comparisons, is_prime
 
 
 class SizesMatchError (ValueError):
@@ -35,13 +53,90 @@ class SquareMatrixRequired (ValueError):
     pass
 
 
+class MatrixTooLarge (ValueError):
+    pass
+
+
+class IntegerMatrixRequired (ValueError):
+    pass
+
+
 MatrixNumber = Union[float, int, Fraction]
+MatrixBuffer = Union[array, List[Fraction]]
+SparseRows = List[Dict[int, MatrixNumber]]  # {column: value} of nonzero elements for every row
+
+
+def parse_number(token: str) -> MatrixNumber:
+    """
+    Convert matrix element from string: integers and p/q fractions are kept exact, others are floats
+    :param token: string representation of element
+    :return: Fraction for exact values, float otherwise
+    """
+    if "/" in token:
+        try:
+            return Fraction(token)
+        except ZeroDivisionError:
+            raise ValueError(f"Zero denominator in '{token}'")
+    try:
+        return Fraction(int(token))
+    except ValueError:
+        if token.lstrip("+-").isdigit():  # integer is too long to be converted
+            raise
+    value = float(token)
+    if not isfinite(value):
+        raise ValueError(f"Element '{token}' is not finite")
+    return value
+
+
+def parse_matrix(text: str, max_size: Optional[int] = None) -> "Matrix":
+    """
+    Read matrix from text in one pass: rows are lines, elements are separated by whitespaces.
+    Every token is converted once and written into final buffer. Matrix is exact while all elements
+    are integers or p/q fractions, first other number switches buffer to floats.
+    :param text: matrix text, empty lines are skipped
+    :param max_size: max count of rows and columns, reading stops as soon as it is exceeded
+    :return: Matrix (SparseMatrix if share of zeros is above SPARSE_THRESHOLD)
+    """
+    data: MatrixBuffer = []
+    exact = True
+    m = n = zeros = 0
+    for line in StringIO(text):
+        tokens = line.split()
+        if not tokens:
+            continue
+        if m == 0:
+            n = len(tokens)
+        elif len(tokens) != n:
+            raise SizesMatchError("Count of elements in every row must be the same")
+        m += 1
+        if max_size is not None and max(m, n) > max_size:
+            raise MatrixTooLarge(f"Matrix size is limited by {max_size}x{max_size}")
+        for token in tokens:
+            value = parse_number(token)
+            if exact and not isinstance(value, Fraction):
+                exact = False
+                data = array("d", data)
+            data.append(value)
+            if not value:
+                zeros += 1
+    if m == 0:
+        raise ValueError("Matrix must contain at least one element")
+    matrix = Matrix.from_buffer(m, n, data, exact=exact)
+    if zeros > Config.SPARSE_THRESHOLD * m * n:
+        return SparseMatrix.from_matrix(matrix)
+    return matrix
 
 
 class Matrix:
-    def __init__(self, m: int, n: int, initial: MatrixNumber = 0):
+    __slots__ = ("__size", "exact", "data", "_lu", "_digest", "_views", "__weakref__")
+
+    def __init__(self, m: int, n: int, initial: MatrixNumber = 0, exact: bool = False):
         self.__size: Tuple[int, int] = (m, n)
-        self.matrix = [[initial] * n for _ in range(m)]
+        self.exact = exact  # exact matrix stores Fraction elements instead of floats
+        self.data: MatrixBuffer = self.allocate(m, n, self.convert(initial))
+        self._lu: Optional["LUDecomposition"] = None
+        self._digest: Optional[int] = None
+        self._views: Optional[WeakValueDictionary] = None  # views reading elements of this matrix by id
 
     @property
     def m(self) -> int:
@@ -59,28 +154,68 @@ class Matrix:
     def size(self) -> Tuple[int, int]:
         return self.__size
 
+    @property
+    def matrix(self) -> List[List[MatrixNumber]]:
+        return [list(self.get_row(i)) for i in range(self.m)]
+
+    def convert(self, value: MatrixNumber) -> MatrixNumber:
+        if self.exact:
+            return value if isinstance(value, Fraction) else Fraction(value)
+        return float(value)
+
+    def buffer(self, values: Iterable[MatrixNumber]) -> MatrixBuffer:
+        # contiguous array of doubles for float matrix, list of Fractions for exact one
+        return list(values) if self.exact else array("d", values)
+
+    def allocate(self, m: int, n: int, value: MatrixNumber) -> MatrixBuffer:
+        return self.buffer([value]) * (m * n)  # elements in row-major order
+
     def __getitem__(self, item: Tuple[int, int]) -> MatrixNumber:
-        return self.matrix[item[0]][item[1]]
+        return self.data[item[0] * self.__size[1] + item[1]]
 
     def __setitem__(self, key: Tuple[int, int], value: MatrixNumber):
-        self.matrix[key[0]][key[1]] = float(value)
+        self.release_views()
+        index = key[0] * self.__size[1] + key[1]
+        value = self.convert(value)
+        if self._digest is not None:  # replace hash of old element by hash of new one
+            self._digest ^= hash((index, self.data[index])) ^ hash((index, value))
+        self.data[index] = value
+        self._lu = None
 
     def __eq__(self, other: "Matrix") -> bool:
         if self.size != other.size:
             return False
-        for i in range(self.m):
-            for j in range(self.n):
-                if self[i, j] != other[i, j]:
-                    return False
-        return True
-
-    def __hash__(self) -> int:  # hashing for lru_cache decorator
-        result = f"{self.m};{self.n};"
-        for row in self.matrix:
-            result += ",".join([str(x) for x in row]) + ";"
-        return int.from_bytes(hashlib.sha256(result.encode()).digest(), "little")
+        return all(a == b for a, b in zip(self.data, other.data))
+
+    def digest(self) -> int:
+        # content hash: kept up to date by element writes and recomputed lazily after row operations
+        if self._digest is None:
+            self._digest = reduce(xor, map(hash, enumerate(self.data)), 0)
+        return self._digest
+
+    def changed(self):
+        # drop everything computed from elements, must be called after direct writes into data
+        self._lu = None
+        self._digest = None
+
+    def add_view(self, view: "MatrixView"):
+        if self._views is None:
+            self._views = WeakValueDictionary()
+        self._views[id(view)] = view
+
+    def release_views(self):
+        # must be called before any change: views get own copy of elements and don't see the change
+        if self._views is not None:
+            for view in list(self._views.values()):
+                view.materialize()
+            self._views = None
 
     def __repr__(self) -> str:
+        if self.exact:
+            return "\n".join([
+                "\t".join([f"{str(x):>6}" for x in row])
+                for row in self.matrix
+            ])
         return "\n".join([
             "\t".join([f"{x:6.3f}" for x in row])
             for row in self.matrix
@@ -89,171 +224,1763 @@ class Matrix:
     def __or__(self, other) -> "Matrix":  # vertical concatenation
         if other.m != self.m:
             raise SizesMatchError("Vertical concatenation works with same rows count")
-        new_matrix = [[] for _ in range(self.m)]
-        for i in range(self.m):
-            new_matrix[i] = self.matrix[i] + other.matrix[i]
-        new = Matrix(self.m, self.n + other.n)
-        new.fill(new_matrix)
-        return new
+        return self.adopt(ConcatenationView(self, other, columns=True))
 
     def __xor__(self, other) -> "Matrix":  # horizontal concatenation
         if other.n != self.n:
             raise SizesMatchError("Horizontal concatenation works with same columns count")
-        new_matrix = self.matrix + other.matrix
-        new = Matrix(self.m + other.m, self.n)
-        new.fill(new_matrix)
-        return new
+        return self.adopt(ConcatenationView(self, other, columns=False))
 
     def __add__(self, other: "Matrix") -> "Matrix":
         if other.size != self.size:
             raise SizesMatchError("Addition available for equal size matrices")
-        result = Matrix(self.m, self.n)
-        for i in range(self.m):
-            for j in range(self.n):
-                result[i, j] = self[i, j] + other[i, j]
-        return result
+        return select_backend(self, other).add(self, other)
 
     def __mul__(self, other: "Matrix") -> "Matrix":
         if self.n != other.m:
             raise SizesMatchError("Multiplication available only for matrices with size MxN and NxL")
-        result = Matrix(self.m, other.n)
-        for i in range(result.m):
-            for j in range(result.n):
-                for k in range(self.n):
-                    result[i, j] += self[i, k] * other[k, j]
-        return result
+        return select_backend(self, other).mul(self, other)
+
+    def __pow__(self, power: int) -> "Matrix":
+        # binary exponentiation: O(log k) multiplications, negative power is power of inverse matrix
+        if not self.is_square:
+            raise SquareMatrixRequired("Power defined only for square (m=n) matrix")
+        base = self.inverse() if power < 0 else self
+        power = abs(power)
+        if power_cost(base, power) > Config.MATRIX_POW_LIMIT:
+            raise CalculationLimitError("Matrix power cost limit exceeded")
+        if power_bits(base, power) > Config.MATRIX_POW_BITS:
+            raise CalculationLimitError("Elements of matrix power are too long")
+        result = None
+        while power:
+            if power & 1:
+                result = base.copy() if result is None else result * base
+            power >>= 1
+            if power:
+                base = base * base
+        return type(self).identity(self.n, exact=self.exact) if result is None else result
 
     def copy(self) -> "Matrix":
-        return Matrix.from_list(self.matrix)
+        return Matrix.from_buffer(self.m, self.n, self.data[:], exact=self.exact)
 
     def fill(self, lst: List[List[MatrixNumber]]):
         rows = len(lst)
         if rows != self.m:
             raise SizesMatchError("Count of rows in list must be same with count of rows in Matrix")
-        for i, row in enumerate(lst):
+        for row in lst:
             if len(row) != self.n:
                 raise SizesMatchError("Count of elements in list row must be same with count of columns in Matrix")
-            for j, element in enumerate(row):
-                self.matrix[i][j] = float(element)
+        self.release_views()
+        self.data = self.buffer(map(self.convert, chain.from_iterable(lst)))
+        self.changed()
+
+    def get_row(self, i: int) -> MatrixBuffer:
+        n = self.__size[1]
+        return self.data[i * n:(i + 1) * n]
+
+    def set_row(self, i: int, values: Iterable[MatrixNumber]):
+        self.release_views()
+        n = self.__size[1]
+        row = self.buffer(map(self.convert, values))
+        if len(row) != n:
+            raise SizesMatchError("Count of elements in row must be same with count of columns in Matrix")
+        self.data[i * n:(i + 1) * n] = row
+        self.changed()
+
+    def subtract_row(self, target: int, source: int, factor: MatrixNumber, start: int = 0):
+        # row[target] -= factor * row[source], only columns from start are touched
+        self.release_views()
+        n = self.__size[1]
+        data = self.data
+        t, s = target * n, source * n
+        data[t + start:t + n] = self.buffer([a - factor * b for a, b in zip(data[t + start:t + n],
+                                                                           data[s + start:s + n])])
+        self.changed()
 
     def minor(self, el_i: int, el_j: int) -> "Matrix":
-        minor = Matrix(self.m - 1, self.n - 1)
-        mi, mj = 0, 0
-        for i, row in enumerate(self.matrix):
-            if i == el_i:
-                continue
-            for j, v in enumerate(row):
-                if j == el_j:
-                    continue
-                minor[mi, mj] = float(v)
-                mj += 1
-            mi += 1
-            mj = 0
-        return minor
+        return self.submatrix([i for i in range(self.m) if i != el_i], [j for j in range(self.n) if j != el_j])
+
+    def submatrix(self, rows: Sequence[int], columns: Sequence[int]) -> "Matrix":
+        return self.adopt(SubmatrixView(self, rows, columns))
+
+    def row_range(self, start: int, stop: int) -> "Matrix":
+        return self.submatrix(range(start, stop), range(self.n))
+
+    def transpose(self) -> "Matrix":
+        return self.adopt(SubmatrixView(self, range(self.m), range(self.n), transposed=True))
+
+    def adopt(self, view: "MatrixView") -> "Matrix":
+        # result of minor, submatrix, transpose and concatenations: lazy view for ordinary matrix
+        return view
 
-    @lru_cache
     def det(self) -> MatrixNumber:
-        if len(self.matrix) == 1 and len(self.matrix[0]) == 1:
-            return self.matrix[0][0]
         if not self.is_square:
             raise SquareMatrixRequired("Determinant defined only for square (m=n) matrix")
-        det_value = 0
-        sgn = 1
-        for i in range(len(self.matrix)):
-            det_value += self.matrix[i][0] * self.minor(i, 0).det() * sgn
-            sgn = -sgn
-        return det_value
+        if prefers_multimodular(self):
+            return result_cache.get_or_compute("det", self, lambda: multimodular_det(self))
+        return result_cache.get_or_compute("det", self, lambda: self.lu().det)
+
+    def rank(self) -> int:
+        return self.lu().rank
+
+    def lu(self) -> "LUDecomposition":
+        if self._lu is None:  # factorization is dropped on every change of the matrix
+            self._lu = LUDecomposition(self)
+        return self._lu
 
     def swap_rows(self, a: int, b: int):
-        for i in range(self.n):
-            self.matrix[a][i], self.matrix[b][i] = self.matrix[b][i], self.matrix[a][i]
+        if a == b:
+            return
+        self.release_views()
+        n = self.__size[1]
+        data = self.data
+        data[a * n:(a + 1) * n], data[b * n:(b + 1) * n] = data[b * n:(b + 1) * n], data[a * n:(a + 1) * n]
+        self.changed()
 
     def swap_columns(self, a: int, b: int):
-        for j in range(self.m):
-            self.matrix[j][a], self.matrix[j][b] = self.matrix[j][b], self.matrix[j][a]
+        self.release_views()
+        n = self.__size[1]
+        data = self.data
+        data[a::n], data[b::n] = data[b::n], data[a::n]
+        self.changed()
 
     def ref(self) -> "Matrix":
-        ref = self.copy()
-        straight_gaussian(ref)
-        return ref
+        return result_cache.get_or_compute("ref", self, lambda: self.lu().upper.copy()).copy()
 
     def inverse(self) -> "Matrix":
-        if not self.is_square or self.det() == 0:
+        if not self.is_square:
             raise NonInvertibleMatrix("Invertible matrix must be square with non-zero determinant")
-        tmp = self.copy()
-        inverse = straight_gaussian(tmp, Matrix.identity(self.n))
-        inverse = reverse_gaussian(tmp, inverse)
-        return inverse
+        return result_cache.get_or_compute("inverse", self, lambda: self.lu().inverse()).copy()
+
+    def solve(self, b: "Matrix") -> "Matrix":
+        return self.lu().solve(b)
+
+    def trace(self) -> MatrixNumber:
+        if not self.is_square:
+            raise SquareMatrixRequired("Trace defined only for square (m=n) matrix")
+        return sum((self[i, i] for i in range(self.n)), self.convert(0))
+
+    def charpoly(self, time_limit: Optional[float] = None) -> List[MatrixNumber]:
+        """
+        Characteristic polynomial det(xI - A), computed without divisions (Berkowitz), O(n^4)
+        :param time_limit: seconds for calculation, CHARPOLY_TIME_LIMIT by default
+        :return: coefficients from x^n (always 1) to constant term (-1)^n * det
+        """
+        if not self.is_square:
+            raise SquareMatrixRequired("Characteristic polynomial defined only for square (m=n) matrix")
+        n = self.n
+        if n <= 2:  # x^2 - tr(A) x + det(A)
+            return [self.convert(1), -self.trace(), self.det()][:n + 1]
+        deadline = time.monotonic() + (Config.CHARPOLY_TIME_LIMIT if time_limit is None else time_limit)
+        if not self.exact:
+            return berkowitz(self.matrix, deadline=deadline)
+        # A = B / d with integer B: coefficient of x^(n-i) is the one of B divided by d^i
+        denominator = reduce(lcm, (x.denominator for i in range(self.m) for x in self.get_row(i)), 1)
+        poly = berkowitz([[int(x * denominator) for x in self.get_row(i)] for i in range(self.m)], deadline=deadline)
+        return [Fraction(c, denominator ** i) for i, c in enumerate(poly)]
+
+    def eigenvalues(self, time_limit: Optional[float] = None) -> List[complex]:
+        """
+        Real and complex eigenvalues: Hessenberg reduction and shifted QR iterations, O(n^3) in total
+        :param time_limit: seconds for calculation, EIGEN_TIME_LIMIT by default
+        :return: eigenvalues with multiplicities
+        """
+        if not self.is_square:
+            raise SquareMatrixRequired("Eigenvalues defined only for square (m=n) matrix")
+        deadline = time.monotonic() + (Config.EIGEN_TIME_LIMIT if time_limit is None else time_limit)
+        return result_cache.get_or_compute("eigenvalues", self, lambda: select_backend(self).eigenvalues(self, deadline))
+
+    def hermite_form(self) -> "Matrix":
+        """
+        Hermite normal form H = UA (U is unimodular): row echelon form with positive pivots
+        and elements above every pivot reduced to 0 <= h < pivot
+        :return: integer matrix of the same size
+        """
+        rows = integer_elements(self)
+        return result_cache.get_or_compute("hnf", self,
+                                           lambda: Matrix.from_list(hermite_normal_form(rows, self.n), exact=True)).copy()
+
+    def smith_form(self) -> List[int]:
+        """
+        Smith normal form D = UAV (U, V are unimodular)
+        :return: diagonal of D, every element divides next one (zeros are at the end)
+        """
+        rows = integer_elements(self)
+        return list(result_cache.get_or_compute("snf", self, lambda: smith_normal_form(rows, self.n)))
 
     @classmethod
-    def from_list(cls, lst: List[List[MatrixNumber]]) -> "Matrix":
-        matrix = Matrix(len(lst), len(lst[0]))
+    def from_buffer(cls, m: int, n: int, data: MatrixBuffer, exact: bool = False) -> "Matrix":
+        # takes ownership of ready buffer: array("d") for float matrix or list of Fractions for exact one
+        matrix = cls.__new__(cls)
+        matrix.__size = (m, n)
+        matrix.exact = exact
+        matrix.data = data
+        matrix._lu = None
+        matrix._digest = None
+        matrix._views = None
+        return matrix
+
+    @classmethod
+    def from_list(cls, lst: List[List[MatrixNumber]], exact: bool = False) -> "Matrix":
+        if cls is Matrix and is_sparse(lst):  # mostly zero matrices are stored sparse
+            cls = SparseMatrix
+        matrix = cls(len(lst), len(lst[0]), exact=exact)
         matrix.fill(lst)
         return matrix
 
     @classmethod
-    def row(cls, lst: List[MatrixNumber]) -> "Matrix":
-        matrix = Matrix(1, len(lst))
+    def row(cls, lst: List[MatrixNumber], exact: bool = False) -> "Matrix":
+        matrix = cls(1, len(lst), exact=exact)
         matrix.fill([lst])
         return matrix
 
     @classmethod
-    def column(cls, lst: List[MatrixNumber]) -> "Matrix":
-        matrix = Matrix(len(lst), 1)
+    def column(cls, lst: List[MatrixNumber], exact: bool = False) -> "Matrix":
+        matrix = cls(len(lst), 1, exact=exact)
         matrix.fill([[x] for x in lst])
         return matrix
 
     @classmethod
-    def zero(cls, m: int, n: int) -> "Matrix":
-        return Matrix(m, n)
+    def zero(cls, m: int, n: int, exact: bool = False) -> "Matrix":
+        return cls(m, n, exact=exact)
 
     @classmethod
-    def identity(cls, n: int) -> "Matrix":
-        matrix = Matrix(n, n)
+    def identity(cls, n: int, exact: bool = False) -> "Matrix":
+        matrix = cls(n, n, exact=exact)
         for i in range(n):
-            matrix.matrix[i][i] = 1
+            matrix[i, i] = 1
         return matrix
 
 
-def straight_gaussian(matrix: Matrix, additional: Matrix = None) -> "Matrix":
-    if additional is None:
-        additional = Matrix.zero(matrix.m, 1)
-    for k in range(matrix.n):  # Straight ahead (Lower left-hand corner jamming)
-        if k >= matrix.m:
+def is_sparse(lst: List[List[MatrixNumber]]) -> bool:
+    # share of zero elements is above SPARSE_THRESHOLD
+    count = sum(len(row) for row in lst)
+    zeros = sum(1 for row in lst for x in row if not x)
+    return count > 0 and zeros > Config.SPARSE_THRESHOLD * count
+
+
+class SparseMatrix (Matrix):
+    """
+    Matrix storing only nonzero elements: data is a list of {column: value} dicts, one per row.
+    Row operations, elimination and multiplication touch only nonzero elements,
+    so their cost is proportional to fill of the matrix instead of its size.
+    """
+    __slots__ = ()
+
+    def allocate(self, m: int, n: int, value: MatrixNumber) -> SparseRows:
+        return [dict.fromkeys(range(n), value) if value else {} for _ in range(m)]
+
+    @property
+    def nonzeros(self) -> int:
+        return sum(len(row) for row in self.data)
+
+    def __getitem__(self, item: Tuple[int, int]) -> MatrixNumber:
+        value = self.data[item[0]].get(item[1])
+        return self.convert(0) if value is None else value
+
+    def __setitem__(self, key: Tuple[int, int], value: MatrixNumber):
+        self.release_views()
+        i, j = key
+        row = self.data[i]
+        value = self.convert(value)
+        if self._digest is not None:  # zeros are not included into digest of sparse matrix
+            index = i * self.n + j
+            if j in row:
+                self._digest ^= hash((index, row[j]))
+            if value:
+                self._digest ^= hash((index, value))
+        if value:
+            row[j] = value
+        else:
+            row.pop(j, None)
+        self._lu = None
+
+    def __eq__(self, other: Matrix) -> bool:
+        if self.size != other.size:
+            return False
+        if isinstance(other, SparseMatrix):
+            return all(a == b for a, b in zip(self.data, other.data))
+        return all(list(self.get_row(i)) == list(other.get_row(i)) for i in range(self.m))
+
+    def digest(self) -> int:
+        if self._digest is None:
+            n = self.n
+            self._digest = reduce(xor, (hash((i * n + j, x)) for i, row in enumerate(self.data)
+                                        for j, x in row.items()), 0)
+        return self._digest
+
+    def copy(self) -> "SparseMatrix":
+        return SparseMatrix.from_buffer(self.m, self.n, [dict(row) for row in self.data], exact=self.exact)
+
+    def fill(self, lst: List[List[MatrixNumber]]):
+        rows = len(lst)
+        if rows != self.m:
+            raise SizesMatchError("Count of rows in list must be same with count of rows in Matrix")
+        for row in lst:
+            if len(row) != self.n:
+                raise SizesMatchError("Count of elements in list row must be same with count of columns in Matrix")
+        self.release_views()
+        self.data = [{j: self.convert(x) for j, x in enumerate(row) if x} for row in lst]
+        self.changed()
+
+    def get_row(self, i: int) -> MatrixBuffer:
+        row = self.buffer([self.convert(0)]) * self.n
+        for j, x in self.data[i].items():
+            row[j] = x
+        return row
+
+    def set_row(self, i: int, values: Iterable[MatrixNumber]):
+        row = [self.convert(x) for x in values]
+        if len(row) != self.n:
+            raise SizesMatchError("Count of elements in row must be same with count of columns in Matrix")
+        self.release_views()
+        self.data[i] = {j: x for j, x in enumerate(row) if x}
+        self.changed()
+
+    def subtract_row(self, target: int, source: int, factor: MatrixNumber, start: int = 0):
+        self.release_views()
+        row = self.data[target]
+        for j, x in self.data[source].items():
+            if j < start:
+                continue
+            value = row.get(j, 0) - factor * x
+            if value:
+                row[j] = self.convert(value)
+            else:
+                row.pop(j, None)
+        self.changed()
+
+    def minor(self, el_i: int, el_j: int) -> "SparseMatrix":
+        rows = [{j - (j > el_j): x for j, x in row.items() if j != el_j}
+                for i, row in enumerate(self.data) if i != el_i]
+        return SparseMatrix.from_buffer(self.m - 1, self.n - 1, rows, exact=self.exact)
+
+    def swap_rows(self, a: int, b: int):
+        if a == b:
+            return
+        self.release_views()
+        self.data[a], self.data[b] = self.data[b], self.data[a]
+        self.changed()
+
+    def swap_columns(self, a: int, b: int):
+        self.release_views()
+        for row in self.data:
+            x, y = row.pop(a, None), row.pop(b, None)
+            if x is not None:
+                row[b] = x
+            if y is not None:
+                row[a] = y
+        self.changed()
+
+    def adopt(self, view: "MatrixView") -> "SparseMatrix":
+        return SparseMatrix.from_matrix(view)
+
+    def to_dense(self) -> Matrix:
+        return Matrix.from_buffer(self.m, self.n, self.buffer(chain.from_iterable(
+            self.get_row(i) for i in range(self.m)
+        )), exact=self.exact)
+
+    @classmethod
+    def from_matrix(cls, matrix: Matrix) -> "SparseMatrix":
+        if isinstance(matrix, SparseMatrix):
+            return matrix.copy()
+        rows = [{j: x for j, x in enumerate(matrix.get_row(i)) if x} for i in range(matrix.m)]
+        return cls.from_buffer(matrix.m, matrix.n, rows, exact=matrix.exact)
+
+
+class MatrixView (Matrix):
+    """
+    Lazy matrix reading elements of other matrices (sources), so creating a view costs O(m + n).
+    Own buffer is built only when view is written or passed to a kernel working with buffers,
+    and before any source is changed: view always behaves like an independent copy.
+    """
+    __slots__ = ("sources", "_buffer")
+
+    def __init__(self, m: int, n: int, exact: bool, sources: Tuple[Matrix, ...]):
+        super().__init__(m, n, exact=exact)
+        self.sources = sources
+        for source in sources:
+            source.add_view(self)
+
+    def allocate(self, m: int, n: int, value: MatrixNumber) -> None:
+        return None
+
+    @property
+    def data(self) -> MatrixBuffer:
+        self.materialize()
+        return self._buffer
+
+    @data.setter
+    def data(self, value: Optional[MatrixBuffer]):
+        self._buffer = value
+
+    @property
+    def materialized(self) -> bool:
+        return self._buffer is not None
+
+    def materialize(self):
+        if self._buffer is None:
+            rows = [self.get_row(i) for i in range(self.m)]  # sources are read while buffer is None
+            self._buffer = self.buffer(chain.from_iterable(rows))
+            self.sources = ()
+
+    def __eq__(self, other: Matrix) -> bool:
+        if self.size != other.size:
+            return False
+        return all(list(self.get_row(i)) == list(other.get_row(i)) for i in range(self.m))
+
+    def digest(self) -> int:
+        if self._digest is None:
+            self._digest = reduce(xor, map(hash, enumerate(chain.from_iterable(
+                self.get_row(i) for i in range(self.m)
+            ))), 0)
+        return self._digest
+
+    def copy(self) -> Matrix:
+        if self.materialized:
+            return super().copy()
+        return Matrix.from_buffer(self.m, self.n, self.buffer(chain.from_iterable(
+            self.get_row(i) for i in range(self.m)
+        )), exact=self.exact)
+
+    @classmethod
+    def zero(cls, m: int, n: int, exact: bool = False) -> Matrix:
+        return Matrix.zero(m, n, exact=exact)
+
+    @classmethod
+    def identity(cls, n: int, exact: bool = False) -> Matrix:
+        return Matrix.identity(n, exact=exact)
+
+
+class SubmatrixView (MatrixView):
+    """
+    Elements source[rows[i], columns[j]] (or transposed). View of not materialized view refers to its source.
+    """
+    __slots__ = ("rows", "columns", "transposed")
+
+    def __init__(self, source: Matrix, rows: Sequence[int], columns: Sequence[int], transposed: bool = False):
+        if isinstance(source, SubmatrixView) and not source.materialized:  # compose index maps
+            if source.transposed:
+                rows, columns = [source.rows[j] for j in columns], [source.columns[i] for i in rows]
+            else:
+                rows, columns = [source.rows[i] for i in rows], [source.columns[j] for j in columns]
+            transposed ^= source.transposed
+            source = source.sources[0]
+        self.rows, self.columns, self.transposed = rows, columns, transposed
+        m, n = (len(columns), len(rows)) if transposed else (len(rows), len(columns))
+        super().__init__(m, n, source.exact, (source,))
+
+    def __getitem__(self, item: Tuple[int, int]) -> MatrixNumber:
+        if self.materialized:
+            return super().__getitem__(item)
+        i, j = item
+        if self.transposed:
+            i, j = j, i
+        return self.sources[0][self.rows[i], self.columns[j]]
+
+    def get_row(self, i: int) -> MatrixBuffer:
+        if self.materialized:
+            return super().get_row(i)
+        source = self.sources[0]
+        if self.transposed:  # row of transposed view is column of source
+            column = self.columns[i]
+            return self.buffer([source[r, column] for r in self.rows])
+        row = source.get_row(self.rows[i])
+        if self.columns == range(source.n):
+            return row
+        return self.buffer([row[j] for j in self.columns])
+
+
+class ConcatenationView (MatrixView):
+    """
+    Matrices a and b joined by columns ([a | b]) or by rows (b under a)
+    """
+    __slots__ = ("by_columns",)
+
+    def __init__(self, a: Matrix, b: Matrix, columns: bool):
+        self.by_columns = columns
+        m, n = (a.m, a.n + b.n) if columns else (a.m + b.m, a.n)
+        super().__init__(m, n, a.exact and b.exact, (a, b))
+
+    def __getitem__(self, item: Tuple[int, int]) -> MatrixNumber:
+        if self.materialized:
+            return super().__getitem__(item)
+        i, j = item
+        a, b = self.sources
+        if self.by_columns:
+            return self.convert(a[i, j] if j < a.n else b[i, j - a.n])
+        return self.convert(a[i, j] if i < a.m else b[i - a.m, j])
+
+    def get_row(self, i: int) -> MatrixBuffer:
+        if self.materialized:
+            return super().get_row(i)
+        a, b = self.sources
+        if self.by_columns:
+            return self.buffer(map(self.convert, chain(a.get_row(i), b.get_row(i))))
+        return self.buffer(map(self.convert, a.get_row(i) if i < a.m else b.get_row(i - a.m)))
+
+
+class ModularMatrix (Matrix):
+    """
+    Matrix over ring Z/n: elements are integers 0 <= x < n, p/q elements are read as p * q^-1.
+    Elimination multiplies rows by modular inverses of pivots, so elements never grow.
+    """
+    __slots__ = ("modulo",)
+
+    def __init__(self, m: int, n: int, modulo: int, initial: MatrixNumber = 0):
+        if modulo < 2:
+            raise ValueError("Ring modulo must be at least 2")
+        self.modulo = modulo
+        super().__init__(m, n, initial, exact=True)
+
+    def convert(self, value: MatrixNumber) -> int:
+        if isinstance(value, int):
+            return value % self.modulo
+        if isinstance(value, float):  # binary fraction of float is not the number user has written
+            raise ValueError("Elements of matrix over Z/n must be integers or p/q fractions")
+        value = Fraction(value)
+        return value.numerator * find_inverse(value.denominator, self.modulo) % self.modulo
+
+    def __eq__(self, other: Matrix) -> bool:
+        return isinstance(other, ModularMatrix) and self.modulo == other.modulo and super().__eq__(other)
+
+    def __add__(self, other: Matrix) -> "ModularMatrix":
+        if other.size != self.size:
+            raise SizesMatchError("Addition available for equal size matrices")
+        self.check_modulo(other)
+        return ModularMatrix.from_values(self.m, self.n, self.modulo, [a + b for a, b in zip(self.data, other.data)])
+
+    def __mul__(self, other: Matrix) -> "ModularMatrix":
+        if self.n != other.m:
+            raise SizesMatchError("Multiplication available only for matrices with size MxN and NxL")
+        self.check_modulo(other)
+        if not isinstance(other, ModularMatrix):
+            other = ModularMatrix.from_list(other.matrix, self.modulo)
+        rows = blocked_multiply(self.matrix, other.matrix)
+        return ModularMatrix.from_values(self.m, other.n, self.modulo, chain.from_iterable(rows))
+
+    def __pow__(self, power: int) -> "ModularMatrix":
+        if power == 0 and self.is_square:
+            return ModularMatrix.identity(self.n, self.modulo)
+        return super().__pow__(power)
+
+    def check_modulo(self, other: Matrix):
+        if isinstance(other, ModularMatrix) and other.modulo != self.modulo:
+            raise SizesMatchError("Matrices must be defined over the same ring")
+
+    def copy(self) -> "ModularMatrix":
+        return ModularMatrix.from_values(self.m, self.n, self.modulo, self.data)
+
+    def adopt(self, view: "MatrixView") -> "ModularMatrix":
+        return ModularMatrix.from_values(view.m, view.n, self.modulo,
+                                         chain.from_iterable(view.get_row(i) for i in range(view.m)))
+
+    def echelon(self, additional: Optional["ModularMatrix"] = None) -> Tuple[List[List[int]], List[int], int]:
+        rows = self.matrix
+        if additional is not None:
+            rows = [row + additional_row for row, additional_row in zip(rows, additional.matrix)]
+        pivots, sign = modular_eliminate(rows, self.n, self.modulo)
+        return rows, pivots, sign
+
+    def det(self) -> int:
+        if not self.is_square:
+            raise SquareMatrixRequired("Determinant defined only for square (m=n) matrix")
+
+        return result_cache.get_or_compute(f"det mod {self.modulo}", self,
+                                           lambda: backend.modular_det(self.matrix, self.modulo))
+
+    def rank(self) -> int:
+        return len(self.echelon()[1])
+
+    def ref(self) -> "ModularMatrix":
+        def compute():
+            rows, pivots, sign = self.echelon()
+            return ModularMatrix.from_values(self.m, self.n, self.modulo, chain.from_iterable(rows))
+        return result_cache.get_or_compute(f"ref mod {self.modulo}", self, compute).copy()
+
+    def inverse(self) -> "ModularMatrix":
+        if not self.is_square:
+            raise NonInvertibleMatrix("Invertible matrix must be square with determinant coprime with modulo")
+
+        def compute():
+            n, modulo = self.n, self.modulo
+            rows, pivots, sign = self.echelon(ModularMatrix.identity(n, modulo))
+            if any(gcd(rows[i][i], modulo) != 1 for i in range(n)):  # determinant is not invertible
+                raise NonInvertibleMatrix("Invertible matrix must be square with determinant coprime with modulo")
+            for k in range(n - 1, -1, -1):  # Backward: pivots are invertible, no fractions needed
+                factor = find_inverse(rows[k][k], modulo)
+                rows[k] = [x * factor % modulo for x in rows[k]]
+                for i in range(k):
+                    leading = rows[i][k]
+                    if leading:
+                        rows[i] = [(a - leading * b) % modulo for a, b in zip(rows[i], rows[k])]
+            return ModularMatrix.from_values(n, n, modulo, chain.from_iterable(row[n:] for row in rows))
+        return result_cache.get_or_compute(f"inverse mod {self.modulo}", self, compute).copy()
+
+    def charpoly(self, time_limit: Optional[float] = None) -> List[int]:
+        if not self.is_square:
+            raise SquareMatrixRequired("Characteristic polynomial defined only for square (m=n) matrix")
+        deadline = time.monotonic() + (Config.CHARPOLY_TIME_LIMIT if time_limit is None else time_limit)
+        return berkowitz(self.matrix, self.modulo, deadline)
+
+    def solve(self, b: Matrix) -> "ModularMatrix":
+        if b.m != self.m:
+            raise SizesMatchError("Right side of system must have same count of rows as matrix")
+        return self.inverse() * b
+
+    @classmethod
+    def from_values(cls, m: int, n: int, modulo: int, values: Iterable[int]) -> "ModularMatrix":
+        # values in row-major order, not reduced yet
+        matrix = cls.from_buffer(m, n, [x % modulo for x in values], exact=True)
+        matrix.modulo = modulo
+        return matrix
+
+    @classmethod
+    def from_list(cls, lst: List[List[MatrixNumber]], modulo: int) -> "ModularMatrix":
+        matrix = cls(len(lst), len(lst[0]), modulo)
+        matrix.fill(lst)
+        return matrix
+
+    @classmethod
+    def from_matrix(cls, matrix: Matrix, modulo: int) -> "ModularMatrix":
+        return cls.from_list(matrix.matrix, modulo)
+
+    @classmethod
+    def zero(cls, m: int, n: int, modulo: int) -> "ModularMatrix":
+        return cls(m, n, modulo)
+
+    @classmethod
+    def identity(cls, n: int, modulo: int) -> "ModularMatrix":
+        matrix = cls(n, n, modulo)
+        for i in range(n):
+            matrix[i, i] = 1
+        return matrix
+
+
+def modular_eliminate(rows: List[List[int]], n: int, modulo: int) -> Tuple[List[int], int]:
+    """
+    Reduce integer rows to row echelon form over Z/n by first n columns.
+    Row with invertible element is taken as pivot, others are reduced by multiplying it by the inverse.
+    If column has no invertible element (composite modulo), pivot is built from gcd of the column:
+    pairs of rows are combined by extended Euclid with unimodular 2x2 transform, so determinant is kept.
+    :param rows: rows with elements 0 <= x < modulo (changed in place)
+    :param n: count of columns to eliminate
+    :param modulo: ring modulo
+    :return: pivot columns and rows permutation sign
+    """
+    m = len(rows)
+    pivots = []
+    sign = 1
+    r = 0
+    for k in range(n):
+        if r >= m:
             break
-        for i in range(k, matrix.m):
-            for j in range(i, matrix.m):
-                if (matrix[i, k] == 0 or abs(matrix[i, k]) > abs(matrix[j, k])) and matrix[j, k] != 0:
-                    matrix.swap_rows(i, j)
-                    additional.swap_rows(i, j)
-        if matrix[k, k] == 0:  # skip if k column full in zeros
+        pivot = next((i for i in range(r, m) if rows[i][k] and gcd(rows[i][k], modulo) == 1), None)
+        if pivot is None:
+            pivot = next((i for i in range(r, m) if rows[i][k]), None)
+        if pivot is None:  # k column full in zeros
             continue
-        for i in range(k + 1, matrix.m):  # Subtract k row from all lower
-            leading = matrix[i, k]
-            for j in range(k, matrix.n):
-                matrix[i, j] -= matrix[k, j] * leading / matrix[k, k]
-            for j in range(additional.n):
-                additional[i, j] -= additional[k, j] * leading / matrix[k, k]
+        if pivot != r:
+            rows[r], rows[pivot] = rows[pivot], rows[r]
+            sign = -sign
+        if gcd(rows[r][k], modulo) == 1:
+            inverse = find_inverse(rows[r][k], modulo)
+            pivot_row = rows[r]
+            for i in range(r + 1, m):
+                leading = rows[i][k] * inverse % modulo
+                if leading:
+                    rows[i] = [(a - leading * b) % modulo for a, b in zip(rows[i], pivot_row)]
+        else:
+            for i in range(r + 1, m):
+                a, b = rows[r][k], rows[i][k]
+                if not b:
+                    continue
+                d, x, y = ext_gcd(a, b)  # [[x, y], [-b/d, a/d]] has determinant 1
+                a, b = a // d, b // d
+                rows[r], rows[i] = ([(x * p + y * q) % modulo for p, q in zip(rows[r], rows[i])],
+                                    [(a * q - b * p) % modulo for p, q in zip(rows[r], rows[i])])
+        pivots.append(k)
+        r += 1
+    return pivots, sign
+
+
+def berkowitz(rows: List[List[MatrixNumber]], modulo: Optional[int] = None,
+              deadline: Optional[float] = None) -> List[MatrixNumber]:
+    """
+    Division-free characteristic polynomial (Berkowitz algorithm), works in any commutative ring.
+    Leading k x k block M is extended by column c, row r and corner a, then
+    p(k+1) = T * p(k), where T is lower triangular Toeplitz matrix with first column
+    (1, -a, -rc, -rMc, ..., -rM^(k-1)c).
+    :param rows: rows of square matrix
+    :param modulo: reduce coefficients modulo this number (ring Z/n)
+    :param deadline: time.monotonic() value, after which CalculationLimitError is raised (None for no limit)
+    :return: coefficients of det(xI - A) from x^n to constant term
+    """
+    def norm(x):
+        return x if modulo is None else x % modulo
+
+    poly = [1]
+    for k in range(len(rows)):
+        r = rows[k][:k]
+        column = [rows[i][k] for i in range(k)]
+        toeplitz = [1, norm(-rows[k][k])]
+        for _ in range(k):
+            if deadline is not None and time.monotonic() > deadline:
+                raise CalculationLimitError("Characteristic polynomial time limit exceeded")
+            toeplitz.append(norm(-sum(a * b for a, b in zip(r, column))))
+            column = [norm(sum(a * b for a, b in zip(rows[i][:k], column))) for i in range(k)]
+        poly = [norm(sum(toeplitz[i - j] * poly[j] for j in range(max(0, i - k - 1), min(i, k) + 1)))
+                for i in range(k + 2)]
+    return poly
+
+
+def det_primes(bound: int, bits: int) -> List[int]:
+    # primes below 2^bits with product greater than bound
+    primes = []
+    p, product = 1 << bits, 1
+    while product <= bound:
+        p -= 1
+        while not is_prime(p):
+            p -= 1
+        primes.append(p)
+        product *= p
+    return primes
+
+
+MULTIMODULAR_SIZE = 40  # exact determinants of this size and greater are computed modulo primes with numpy
+
+
+def prefers_multimodular(matrix: Matrix) -> bool:
+    # eliminations modulo primes are vectorized, while Bareiss works with long integers in pure Python
+    return (backend is not python_backend and matrix.exact and matrix._lu is None and matrix.n >= MULTIMODULAR_SIZE
+            and not isinstance(matrix, (SparseMatrix, ModularMatrix)))
+
+
+def multimodular_det(matrix: Matrix) -> Fraction:
+    """
+    Determinant of exact matrix from determinants modulo primes, glued by Chinese remainder theorem.
+    Rows are scaled to integers, primes are taken until their product exceeds twice the Hadamard bound
+    |det| <= prod ||row||, so result is exact.
+    :param matrix: square exact matrix
+    :return: determinant
+    """
+    if not matrix.is_square:
+        raise SquareMatrixRequired("Determinant defined only for square (m=n) matrix")
+    rows, scales = integer_rows(matrix, Matrix.zero(matrix.m, 0, exact=True))
+    bound = 2 * (isqrt(prod(sum(x * x for x in row) for row in rows)) + 1)
+    comparisons = {p: backend.modular_det(rows, p) for p in det_primes(bound, backend.prime_bits)}
+    det_value, product = solve_comparisons(comparisons)
+    if det_value > product // 2:
+        det_value -= product
+    return Fraction(det_value, prod(scales))
+
+
+def integer_elements(matrix: Matrix) -> List[List[int]]:
+    if isinstance(matrix, ModularMatrix) or not matrix.exact:
+        raise IntegerMatrixRequired("Normal forms defined only for integer matrices")
+    rows = [matrix.get_row(i) for i in range(matrix.m)]
+    if any(x.denominator != 1 for row in rows for x in row):
+        raise IntegerMatrixRequired("Normal forms defined only for integer matrices")
+    return [[int(x) for x in row] for row in rows]
+
+
+def independent_rows(rows: List[List[int]], n: int, modulo: int) -> List[int]:
+    # indices of first n rows, which are linearly independent modulo prime (so they are over Q too)
+    basis = {}  # pivot column: reduced row with 1 in it
+    selected = []
+    for index, row in enumerate(rows):
+        row = [x % modulo for x in row]
+        for k, base in basis.items():
+            if row[k]:
+                factor = row[k]
+                row = [(x - factor * y) % modulo for x, y in zip(row, base)]
+        k = next((j for j, x in enumerate(row) if x), None)
+        if k is None:
+            continue
+        inverse = find_inverse(row[k], modulo)
+        basis[k] = [x * inverse % modulo for x in row]
+        for j, base in basis.items():
+            if j != k and base[k]:
+                factor = base[k]
+                basis[j] = [(x - factor * y) % modulo for x, y in zip(base, basis[k])]
+        selected.append(index)
+        if len(selected) == n:
+            break
+    return selected
+
+
+def modular_hermite(rows: List[List[int]], n: int, det_multiple: int) -> List[List[int]]:
+    """
+    Hermite normal form of full rank lattice modulo multiple D of its determinant (Domich, Kannan, Trotter).
+    Lattice contains D * e_j, so elements are reduced modulo D. Column k is gathered into one row
+    by unimodular ext_gcd transforms, pivot is gcd of the column and R, then R is divided by the pivot:
+    sublattice of the rest columns has determinant dividing R / pivot.
+    :param rows: integer rows generating lattice of rank n
+    :param n: count of columns
+    :param det_multiple: positive multiple of the lattice determinant
+    :return: n rows of Hermite normal form
+    """
+    modulo = det_multiple
+    generators = [[x % modulo for x in row] for row in rows]
+    result = []
+    for k in range(n):
+        pivot = None
+        others = []
+        for row in generators:
+            if not row[k]:
+                others.append(row)
+            elif pivot is None:
+                pivot = row
+            else:
+                d, x, y = ext_gcd(pivot[k], row[k])  # [[x, y], [-b/d, a/d]] has determinant 1
+                a, b = pivot[k] // d, row[k] // d
+                pivot, row = ([(x * p + y * q) % modulo for p, q in zip(pivot, row)],
+                              [(a * q - b * p) % modulo for p, q in zip(pivot, row)])
+                others.append(row)
+        if pivot is None:
+            pivot = [0] * n
+        leading = pivot[k]
+        d, x, _ = ext_gcd(leading, modulo)  # x * pivot + y * (R * e_k) has d in k column
+        h = [x * p % modulo for p in pivot]
+        h[k] = d
+        result.append(h)
+        modulo //= d
+        generators = [[x % modulo for x in row] for row in others]
+        generators.append([(p - leading // d * q) % modulo for p, q in zip(pivot, h)])
+    for k in range(n):
+        for i in range(k):
+            factor = result[i][k] // result[k][k]
+            if factor:
+                result[i] = [p - factor * q for p, q in zip(result[i], result[k])]
+    return result
+
+
+def hermite_normal_form(rows: List[List[int]], n: int) -> List[List[int]]:
+    """
+    Hermite normal form of integer matrix. Matrix of rank n is reduced modulo determinant
+    of n independent rows, so elements stay bounded by it. Otherwise rows are eliminated
+    by unimodular ext_gcd transforms over integers with reduction of elements above pivots.
+    :param rows: integer rows
+    :param n: count of columns
+    :return: rows of Hermite normal form (zero rows are at the end)
+    """
+    m = len(rows)
+    if m >= n:
+        selected = independent_rows(rows, n, det_primes(1, 62)[0])
+        if len(selected) == n:
+            det_multiple = abs(int(Matrix.from_list([rows[i] for i in selected], exact=True).det()))
+            if det_multiple:  # zero, if rows are dependent over Q, but not modulo prime
+                return modular_hermite(rows, n, det_multiple) + [[0] * n for _ in range(m - n)]
+    rows = [row[:] for row in rows]
+    r = 0
+    for k in range(n):
+        pivot = next((i for i in range(r, m) if rows[i][k]), None)
+        if pivot is None:
+            continue
+        rows[r], rows[pivot] = rows[pivot], rows[r]
+        for i in range(r + 1, m):
+            if rows[i][k]:
+                d, x, y = ext_gcd(rows[r][k], rows[i][k])
+                a, b = rows[r][k] // d, rows[i][k] // d
+                rows[r], rows[i] = ([x * p + y * q for p, q in zip(rows[r], rows[i])],
+                                    [a * q - b * p for p, q in zip(rows[r], rows[i])])
+        if rows[r][k] < 0:
+            rows[r] = [-x for x in rows[r]]
+        for i in range(r):
+            factor = rows[i][k] // rows[r][k]
+            if factor:
+                rows[i] = [p - factor * q for p, q in zip(rows[i], rows[r])]
+        r += 1
+        if r == m:
+            break
+    return rows
+
+
+def smith_normal_form(rows: List[List[int]], n: int) -> List[int]:
+    """
+    Smith normal form of integer matrix. Nonzero rows of Hermite normal form of A and then of its transpose
+    give nonsingular r x r triangular matrix T with the same invariant factors. Then Hermite forms
+    of transposed T are taken modulo D = |det T| until T is diagonal (Kannan, Bachem),
+    and diagonal elements are replaced by gcd and lcm pairwise.
+    :param rows: integer rows
+    :param n: count of columns
+    :return: invariant factors, zeros up to min(m, n) elements
+    """
+    size = min(len(rows), n)
+    triangular = [row for row in hermite_normal_form(rows, n) if any(row)]
+    r = len(triangular)
+    if not r:
+        return [0] * size
+    if r < n:
+        triangular = [row for row in hermite_normal_form([list(column) for column in zip(*triangular)], r) if any(row)]
+    det_value = prod(triangular[i][i] for i in range(r))
+    while any(triangular[i][j] for i in range(r) for j in range(i + 1, r)):
+        triangular = modular_hermite([list(column) for column in zip(*triangular)], r, det_value)
+    diagonal = [triangular[i][i] for i in range(r)]
+    for i in range(r):
+        for j in range(i + 1, r):
+            d = gcd(diagonal[i], diagonal[j])
+            diagonal[i], diagonal[j] = d, diagonal[i] * diagonal[j] // d
+    return diagonal + [0] * (size - r)
+
+
+def power_cost(matrix: Matrix, power: int) -> int:
+    """
+    Estimate cost of matrix ** power in elementary operations
+    :param matrix: square matrix
+    :param power: non-negative exponent
+    :return: n^3 operations for every multiplication, for exact matrices weighted by length of elements
+    """
+    n = matrix.n
+    multiplications = max(power.bit_length() + bin(power).count("1") - 2, 0)
+    if not matrix.exact or isinstance(matrix, ModularMatrix):  # elements don't grow
+        return n ** 3 * multiplications
+    # elements of A^k have up to k * log2(n * max|a|) bits, so last squarings dominate:
+    # long arithmetic costs about twice the last multiplication of such numbers (Karatsuba),
+    # machine word operation is counted as 1/64 of interpreted one
+    bits = max((max(x.numerator.bit_length(), x.denominator.bit_length())
+                for i in range(matrix.m) for x in matrix.get_row(i)), default=0)
+    words = power * (bits + n.bit_length()) // 64 + 1
+    return n ** 3 * (multiplications + 2 * int(words ** 1.6) // 64)
+
+
+def power_bits(matrix: Matrix, power: int) -> float:
+    """
+    Estimate length of elements of matrix ** power: |A^k| <= (n * max|a|)^k
+    :param matrix: square matrix
+    :param power: non-negative exponent
+    :return: bits of the longest element, 0 for float and modular matrices (their elements don't grow)
+    """
+    if not matrix.exact or isinstance(matrix, ModularMatrix):
+        return 0
+    largest = max((max(abs(x.numerator), x.denominator)
+                   for i in range(matrix.m) for x in matrix.get_row(i) if x), default=0)
+    return power * log2(matrix.n * largest) if largest else 0
+
+
+def estimate_size(value) -> int:
+    """
+    Approximate memory used by value in bytes
+    :param value: number or Matrix
+    :return: size in bytes
+    """
+    if isinstance(value, SparseMatrix):
+        size = sys.getsizeof(value.data) + sum(sys.getsizeof(row) for row in value.data)
+        if value.exact:
+            size += sum(sys.getsizeof(x.numerator) + sys.getsizeof(x.denominator)
+                        for row in value.data for x in row.values())
+        return size
+    if isinstance(value, Matrix):
+        size = sys.getsizeof(value.data)
+        if value.exact:
+            size += sum(sys.getsizeof(x.numerator) + sys.getsizeof(x.denominator) for x in value.data)
+        return size
+    if isinstance(value, Fraction):
+        return sys.getsizeof(value.numerator) + sys.getsizeof(value.denominator)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of operation results, keyed by matrix content.
+    Entry stores copy of matrix, so hash collisions can't return a wrong result.
+    Cache is shared by bot threads: entries are accessed under lock, results are computed without it.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries: OrderedDict = OrderedDict()  # key -> (copy of matrix, result, size in bytes)
+        self.lock = threading.Lock()
+
+    def get_or_compute(self, operation: str, matrix: Matrix, compute: Callable[[], object]):
+        """
+        Get result of operation for matrix from cache or compute and remember it
+        :param operation: operation name
+        :param matrix: operation argument
+        :param compute: function calculating result
+        :return: result of operation
+        """
+        if self.max_bytes <= 0:
+            return compute()
+        key = (operation, matrix.size, matrix.exact, matrix.digest())
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == matrix:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return entry[1]
+            self.misses += 1
+        result = compute()
+        snapshot = matrix.copy()
+        size = 2 * estimate_size(snapshot) + estimate_size(result)
+        if size > self.max_bytes:
+            return result
+        with self.lock:
+            # entry could be replaced by other thread while result was computed
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.used_bytes -= entry[2]
+            self.entries[key] = (snapshot, result, size)
+            self.entries.move_to_end(key)
+            self.used_bytes += size
+            while self.used_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.used_bytes -= evicted_size
+        return result
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.used_bytes = 0
+
+    def stats(self) -> str:
+        return (f"entries: {len(self.entries)}, memory: {self.used_bytes}/{self.max_bytes} bytes, "
+                f"hits: {self.hits}, misses: {self.misses}")
+
+
+result_cache = ResultCache(Config.MATRIX_CACHE_SIZE)
+
+
+class LUDecomposition:
+    """
+    Row echelon factorization E * A = U of matrix A, where E is product of elementary row operations.
+    Computed once per matrix and shared by det, rank, ref, inverse and solve.
+    Exact matrices are factorized fraction-free: E and U are kept as integer rows of Bareiss elimination.
+    """
+    def __init__(self, matrix: Matrix):
+        self.size = matrix.size
+        self.exact = matrix.exact
+        self._upper: Optional[Matrix] = None
+        self._transform: Optional[Matrix] = None
+        # sparse matrices are eliminated in place with Fractions, Bareiss rows would be dense
+        self.fraction_free = self.exact and not isinstance(matrix, SparseMatrix)
+        if self.fraction_free:
+            self.rows, scales = integer_rows(matrix, Matrix.identity(matrix.m, exact=True))
+            self.pivots, self.divisors, sign = bareiss(self.rows, matrix.n)
+            self.transform_det = sign * reduce(lambda a, b: a * b, scales, 1)
+        else:
+            self._upper = matrix.copy()
+            self._transform = type(matrix).identity(matrix.m, exact=self.exact)
+            self.pivots, self.transform_det = eliminate(self._upper, self._transform)
+
+    @property
+    def upper(self) -> Matrix:
+        if self._upper is None:
+            self._upper, self._transform = rational_rows(self.rows, self.divisors, self.size[1])
+        return self._upper
+
+    @property
+    def transform(self) -> Matrix:
+        if self._transform is None:
+            self._upper, self._transform = rational_rows(self.rows, self.divisors, self.size[1])
+        return self._transform
+
+    @property
+    def rank(self) -> int:
+        return len(self.pivots)
+
+    @property
+    def is_invertible(self) -> bool:
+        return self.size[0] == self.size[1] == self.rank
+
+    @property
+    def det(self) -> MatrixNumber:
+        if self.size[0] != self.size[1]:
+            raise SquareMatrixRequired("Determinant defined only for square (m=n) matrix")
+        if self.fraction_free:  # last Bareiss pivot is determinant of scaled matrix
+            return Fraction(self.divisors[-1] if self.is_invertible else 0, self.transform_det)
+        if not self.is_invertible:
+            return self.upper.convert(0)
+        det_value = self.upper.convert(1)
+        for k in range(self.size[0]):
+            det_value *= self.upper[k, k]
+        return det_value / self.transform_det
+
+    def solve(self, b: Matrix) -> Matrix:
+        """
+        Solve system A * X = B
+        :param b: right side matrix with same count of rows as A
+        :return: solution X
+        """
+        if b.m != self.size[0]:
+            raise SizesMatchError("Right side of system must have same count of rows as matrix")
+        if not self.is_invertible:
+            raise NonInvertibleMatrix("System has unique solution only for invertible matrix")
+        return select_backend(self.upper, b).back_substitution(self.upper, self.transform * b)
+
+    def inverse(self) -> Matrix:
+        if not self.is_invertible:
+            raise NonInvertibleMatrix("Invertible matrix must be square with non-zero determinant")
+        if self.fraction_free:
+            return self.fraction_free_inverse()
+        return select_backend(self.upper).back_substitution(self.upper, self.transform)
+
+    def fraction_free_inverse(self) -> Matrix:
+        # Row i of Bareiss rows is [d(i-1) * U | d(i-1) * E], where d(i) - leading minors.
+        # Back substitution for det * X stays in integers: all divisions by d(i) are exact.
+        n = self.size[0]
+        det_value = self.divisors[-1]
+        x = [None] * n
+        for i in range(n - 1, -1, -1):
+            row = self.rows[i]
+            values = [det_value * a for a in row[n:]]
+            for j in range(i + 1, n):
+                if row[j]:
+                    values = [a - row[j] * b for a, b in zip(values, x[j])]
+            x[i] = [a // row[i] for a in values]
+        return Matrix.from_buffer(n, n, [Fraction(a, det_value) for a in chain.from_iterable(x)], exact=True)
+
+
+EPSILON = 2.0 ** -52  # float machine epsilon, pivots below n * EPSILON * max|a| are treated as zeros
+
+
+class PythonBackend:
+    """
+    Matrix kernels in pure Python, work with both float and exact matrices
+    """
+    name = "python"
+    prime_bits = 62  # size of primes for multimodular determinant
+
+    def add(self, a: Matrix, b: Matrix) -> Matrix:
+        result = Matrix(a.m, a.n, exact=a.exact and b.exact)
+        result.data = result.buffer([x + y for x, y in zip(a.data, b.data)])
+        return result
+
+    def mul(self, a: Matrix, b: Matrix) -> Matrix:
+        if a.exact and b.exact:  # common denominators keep products in integers without gcd on every step
+            a_denominator = reduce(lcm, (x.denominator for x in a.data), 1)
+            b_denominator = reduce(lcm, (x.denominator for x in b.data), 1)
+            a_rows = [[int(x * a_denominator) for x in a.get_row(i)] for i in range(a.m)]
+            b_rows = [[int(x * b_denominator) for x in b.get_row(i)] for i in range(b.m)]
+        else:
+            a_rows = [list(map(float, a.get_row(i))) for i in range(a.m)]
+            b_rows = [list(map(float, b.get_row(i))) for i in range(b.m)]
+        if max(a.m, a.n, b.n) > Config.STRASSEN_THRESHOLD:
+            rows = strassen_multiply(a_rows, b_rows, Config.STRASSEN_THRESHOLD)
+        else:
+            rows = blocked_multiply(a_rows, b_rows)
+        if a.exact and b.exact:
+            denominator = a_denominator * b_denominator
+            return Matrix.from_buffer(a.m, b.n, [Fraction(x, denominator) for x in chain.from_iterable(rows)],
+                                      exact=True)
+        return Matrix.from_buffer(a.m, b.n, array("d", chain.from_iterable(rows)))
+
+    def eliminate(self, matrix: Matrix, additional: Matrix) -> Tuple[List[int], int]:
+        m, n = matrix.size
+        data = matrix.data
+        tolerance = EPSILON * max(m, n) * max(map(abs, data), default=0)
+        pivots = []
+        sign = 1
+        r = 0
+        for k in range(n):  # Straight ahead (Lower left-hand corner jamming)
+            if r >= m:
+                break
+            pivot = max(range(r, m), key=lambda i: abs(data[i * n + k]))  # partial pivoting
+            if abs(data[pivot * n + k]) <= tolerance:  # skip if k column full in zeros
+                continue
+            if pivot != r:
+                matrix.swap_rows(r, pivot)
+                additional.swap_rows(r, pivot)
+                sign = -sign
+            for i in range(r + 1, m):  # Subtract r row from all lower
+                leading = data[i * n + k] / data[r * n + k]
+                if leading == 0:
+                    continue
+                matrix.subtract_row(i, r, leading, k)
+                additional.subtract_row(i, r, leading)
+                data[i * n + k] = matrix.convert(0)
+            pivots.append(k)
+            r += 1
+        return pivots, sign
+
+    def modular_det(self, rows: List[List[int]], modulo: int) -> int:
+        rows = [[x % modulo for x in row] for row in rows]
+        pivots, sign = modular_eliminate(rows, len(rows), modulo)  # echelon form of square matrix is triangular
+        return sign * prod(rows[i][i] for i in range(len(rows))) % modulo
+
+    def eigenvalues(self, matrix: Matrix, deadline: float) -> List[complex]:
+        a = [list(map(float, matrix.get_row(i))) for i in range(matrix.m)]
+        balance(a)
+        hessenberg(a, deadline)
+        return shifted_qr(a, deadline)
+
+    def back_substitution(self, upper: Matrix, rhs: Matrix) -> Matrix:
+        n = upper.n
+        x = [None] * n  # rows of solution, each row is computed for all right sides at once
+        for i in range(n - 1, -1, -1):
+            upper_row = upper.get_row(i)
+            row = list(rhs.get_row(i))
+            for j in range(i + 1, n):
+                if upper_row[j]:
+                    row = [a - upper_row[j] * b for a, b in zip(row, x[j])]
+            x[i] = [a / upper_row[i] for a in row]
+        return Matrix.from_list(x, exact=upper.exact and rhs.exact)
+
+
+class NumpyBackend (PythonBackend):
+    """
+    Vectorized kernels for float matrices. NumPy arrays are zero-copy views over array("d") buffers.
+    """
+    name = "numpy"
+    prime_bits = 31  # products of elements fit into int64
+
+    @staticmethod
+    def view(matrix: Matrix) -> "numpy.ndarray":
+        if not matrix.data:
+            return numpy.zeros(matrix.size)
+        return numpy.frombuffer(matrix.data, dtype=numpy.float64).reshape(matrix.size)
+
+    @staticmethod
+    def from_array(result: "numpy.ndarray") -> Matrix:
+        m, n = result.shape
+        return Matrix.from_buffer(m, n, array("d", numpy.ascontiguousarray(result, dtype=numpy.float64).tobytes()))
+
+    def add(self, a: Matrix, b: Matrix) -> Matrix:
+        return self.from_array(self.view(a) + self.view(b))
+
+    def mul(self, a: Matrix, b: Matrix) -> Matrix:
+        return self.from_array(self.view(a) @ self.view(b))
+
+    def eliminate(self, matrix: Matrix, additional: Matrix) -> Tuple[List[int], int]:
+        m, n = matrix.size
+        matrix.release_views()
+        additional.release_views()
+        a, e = self.view(matrix), self.view(additional)  # changes go directly into matrix buffers
+        tolerance = EPSILON * max(m, n) * (numpy.abs(a).max() if a.size else 0)
+        pivots = []
+        sign = 1
+        r = 0
+        for k in range(n):
+            if r >= m:
+                break
+            pivot = r + int(numpy.argmax(numpy.abs(a[r:, k])))
+            if abs(a[pivot, k]) <= tolerance:
+                continue
+            if pivot != r:
+                a[[r, pivot]] = a[[pivot, r]]
+                e[[r, pivot]] = e[[pivot, r]]
+                sign = -sign
+            factors = a[r + 1:, k] / a[r, k]
+            a[r + 1:, k:] -= numpy.outer(factors, a[r, k:])
+            e[r + 1:] -= numpy.outer(factors, e[r])
+            a[r + 1:, k] = 0
+            pivots.append(k)
+            r += 1
+        matrix.changed()
+        additional.changed()
+        return pivots, sign
+
+    def modular_det(self, rows: List[List[int]], modulo: int) -> int:
+        if modulo >> self.prime_bits or not rows:
+            return super().modular_det(rows, modulo)
+        a = numpy.array([[x % modulo for x in row] for row in rows], dtype=numpy.int64)
+        n = len(rows)
+        det_value = 1
+        for k in range(n):
+            nonzero = numpy.flatnonzero(a[k:, k])
+            if not nonzero.size:
+                return 0
+            pivot = k + int(nonzero[0])
+            if pivot != k:
+                a[[k, pivot]] = a[[pivot, k]]
+                det_value = -det_value
+            value = int(a[k, k])
+            if gcd(value, modulo) != 1:  # composite modulo needs Euclid steps
+                return super().modular_det(rows, modulo)
+            det_value = det_value * value % modulo
+            leading = a[k + 1:, k] * find_inverse(value, modulo) % modulo
+            a[k + 1:, k:] = (a[k + 1:, k:] - numpy.outer(leading, a[k, k:]) % modulo) % modulo
+        return det_value % modulo
+
+    def eigenvalues(self, matrix: Matrix, deadline: float) -> List[complex]:
+        # LAPACK does the same balancing, Hessenberg reduction and shifted QR
+        return [complex(x) for x in numpy.linalg.eigvals(self.view(matrix))]
+
+    def back_substitution(self, upper: Matrix, rhs: Matrix) -> Matrix:
+        n = upper.n
+        return self.from_array(numpy.linalg.solve(self.view(upper)[:n], self.view(rhs)[:n]))
+
+
+class SparseBackend (PythonBackend):
+    """
+    Kernels for sparse matrices, work with both float and exact elements. Only nonzero elements are touched.
+    """
+    name = "sparse"
+
+    @staticmethod
+    def rows(matrix: Matrix) -> SparseRows:
+        if isinstance(matrix, SparseMatrix):
+            return matrix.data
+        return SparseMatrix.from_matrix(matrix).data
+
+    @staticmethod
+    def from_rows(m: int, n: int, rows: SparseRows, exact: bool) -> SparseMatrix:
+        convert = Fraction if exact else float
+        return SparseMatrix.from_buffer(m, n, [{j: convert(x) for j, x in row.items() if x} for row in rows],
+                                        exact=exact)
+
+    def add(self, a: Matrix, b: Matrix) -> Matrix:
+        rows = [dict(row) for row in self.rows(a)]
+        for row, other in zip(rows, self.rows(b)):
+            for j, x in other.items():
+                row[j] = row.get(j, 0) + x
+        return self.from_rows(a.m, a.n, rows, a.exact and b.exact)
+
+    def mul(self, a: Matrix, b: Matrix) -> Matrix:
+        b_rows = self.rows(b)
+        rows = []
+        for a_row in self.rows(a):  # row i of product is sum of rows of b with nonzero a[i, k]
+            row = {}
+            for k, x in a_row.items():
+                for j, y in b_rows[k].items():
+                    row[j] = row.get(j, 0) + x * y
+            rows.append(row)
+        return self.from_rows(a.m, b.n, rows, a.exact and b.exact)
+
+    def eliminate(self, matrix: Matrix, additional: Matrix) -> Tuple[List[int], int]:
+        if not isinstance(additional, SparseMatrix):  # eliminate sparse copy and write result back
+            extra = SparseMatrix.from_matrix(additional)
+            result = self.eliminate(matrix, extra)
+            additional.fill(extra.matrix)
+            return result
+        if not isinstance(matrix, SparseMatrix):
+            return python_backend.eliminate(matrix, additional)
+        m, n = matrix.size
+        rows = matrix.data
+        tolerance = 0 if matrix.exact else EPSILON * max(m, n) * max(
+            (abs(x) for row in rows for x in row.values()), default=0
+        )
+        pivots = []
+        sign = 1
+        r = 0
+        for k in range(n):
+            if r >= m:
+                break
+            candidates = [i for i in range(r, m) if k in rows[i]]
+            if not candidates:
+                continue
+            if matrix.exact:  # any nonzero pivot is exact, the sparsest one produces less fill-in
+                pivot = min(candidates, key=lambda i: len(rows[i]))
+            else:
+                pivot = max(candidates, key=lambda i: abs(rows[i][k]))
+            if abs(rows[pivot][k]) <= tolerance:
+                continue
+            if pivot != r:
+                matrix.swap_rows(r, pivot)
+                additional.swap_rows(r, pivot)
+                sign = -sign
+            for i in range(r + 1, m):  # rows with zero in k column are skipped
+                if k not in rows[i]:
+                    continue
+                leading = rows[i][k] / rows[r][k]
+                matrix.subtract_row(i, r, leading, k)
+                additional.subtract_row(i, r, leading)
+                rows[i].pop(k, None)
+            pivots.append(k)
+            r += 1
+        return pivots, sign
+
+    def back_substitution(self, upper: Matrix, rhs: Matrix) -> Matrix:
+        upper_rows, rhs_rows = self.rows(upper), self.rows(rhs)
+        n = upper.n
+        x = [None] * n
+        for i in range(n - 1, -1, -1):
+            row = dict(rhs_rows[i])
+            for j, u in upper_rows[i].items():
+                if j > i:
+                    for c, v in x[j].items():
+                        row[c] = row.get(c, 0) - u * v
+            x[i] = {c: v / upper_rows[i][i] for c, v in row.items() if v}
+        return self.from_rows(n, rhs.n, x, upper.exact and rhs.exact)
+
+
+python_backend = PythonBackend()
+sparse_backend = SparseBackend()
+backend: PythonBackend = python_backend  # default backend for float matrices
+
+
+def set_backend(name: str):
+    """
+    Select kernels for float matrices
+    :param name: "python", "numpy" or "auto" (numpy if it is installed)
+    """
+    global backend
+    if name == "auto":
+        name = "python" if numpy is None else "numpy"
+    if name == "numpy":
+        if numpy is None:
+            raise ImportError("NumPy backend requested, but numpy is not installed")
+        backend = NumpyBackend()
+    elif name == "python":
+        backend = python_backend
+    else:
+        raise ValueError(f"Unknown matrix backend '{name}'")
+
+
+def select_backend(*matrices: Matrix) -> PythonBackend:
+    if any(isinstance(matrix, SparseMatrix) for matrix in matrices):
+        return sparse_backend
+    # exact arithmetic is available only in pure Python
+    if any(matrix.exact for matrix in matrices):
+        return python_backend
+    return backend
+
+
+def eliminate(matrix: Matrix, additional: Matrix) -> Tuple[List[int], MatrixNumber]:
+    """
+    Reduce matrix to row echelon form, applying same row operations to additional matrix
+    :param matrix: matrix to reduce (changed in place)
+    :param additional: matrix with same count of rows (changed in place)
+    :return: list of pivot columns and determinant of applied row operations
+    """
+    kernels = select_backend(matrix, additional)
+    if kernels is python_backend and matrix.exact and additional.exact:
+        rows, scales = integer_rows(matrix, additional)
+        pivots, divisors, sign = bareiss(rows, matrix.n)
+        upper, transform = rational_rows(rows, divisors, matrix.n)
+        for i in range(matrix.m):
+            matrix.set_row(i, upper.get_row(i))
+            additional.set_row(i, transform.get_row(i))
+        return pivots, sign * reduce(lambda a, b: a * b, scales, 1)
+    return kernels.eliminate(matrix, additional)
+
+
+def integer_rows(matrix: Matrix, additional: Matrix) -> Tuple[List[List[int]], List[int]]:
+    # Rows of exact [matrix | additional] multiplied by the least common denominator of each row
+    rows = [list(chain(matrix.get_row(i), additional.get_row(i))) for i in range(matrix.m)]
+    scales = [reduce(lcm, (x.denominator for x in row), 1) for row in rows]
+    return [[int(x * scale) for x in row] for row, scale in zip(rows, scales)], scales
+
+
+def rational_rows(rows: List[List[int]], divisors: List[int], n: int) -> Tuple[Matrix, Matrix]:
+    # Gaussian rows from Bareiss rows, split into matrix (n columns) and additional part
+    rank = len(divisors) - 1
+    m, width = len(rows), len(rows[0])
+    matrix_data, additional_data = [], []
+    for i, row in enumerate(rows):
+        divisor = divisors[min(i, rank)]
+        matrix_data += [Fraction(x, divisor) for x in row[:n]]
+        additional_data += [Fraction(x, divisor) for x in row[n:]]
+    return Matrix.from_buffer(m, n, matrix_data, exact=True), Matrix.from_buffer(m, width - n, additional_data, exact=True)
+
+
+def bareiss(rows: List[List[int]], n: int) -> Tuple[List[int], List[int], int]:
+    """
+    Fraction-free (Bareiss) elimination of integer rows by first n columns.
+    Every intermediate value is a minor of the matrix, so coefficients grow linearly in size
+    instead of exponentially and no gcd is computed inside the loop.
+    :param rows: integer rows (changed in place)
+    :param n: count of columns to eliminate
+    :return: pivot columns, leading minors (row i holds Gaussian row multiplied by divisor i) and rows permutation sign
+    """
+    m, width = len(rows), len(rows[0])
+    divisors = [1]
+    pivots = []
+    sign = 1
+    r = 0
+    for k in range(n):
+        if r >= m:
+            break
+        pivot = next((i for i in range(r, m) if rows[i][k] != 0), None)
+        if pivot is None:
+            continue
+        if pivot != r:
+            rows[r], rows[pivot] = rows[pivot], rows[r]
+            sign = -sign
+        pivot_row = rows[r]
+        previous = divisors[-1]
+        for i in range(r + 1, m):
+            row = rows[i]
+            for j in range(k + 1, width):
+                row[j] = (row[j] * pivot_row[k] - row[k] * pivot_row[j]) // previous
+            row[k] = 0
+        divisors.append(pivot_row[k])
+        pivots.append(k)
+        r += 1
+    return pivots, divisors, sign
+
+
+BLOCK_SIZE = 64  # rows of right matrix used by one pass of blocked multiplication
+
+
+def blocked_multiply(a: List[List[MatrixNumber]], b: List[List[MatrixNumber]],
+                     block: int = BLOCK_SIZE) -> List[List[MatrixNumber]]:
+    """
+    Row-oriented (i-k-j) product of matrices given as lists of rows.
+    Inner dimension is split in blocks, so rows of b are reused while they are hot.
+    :param a: left matrix rows
+    :param b: right matrix rows
+    :param block: count of b rows in one block
+    :return: rows of product
+    """
+    width = len(b[0]) if b else 0
+    result = [[0] * width for _ in a]
+    for start in range(0, len(b), block):
+        b_block = b[start:start + block]
+        for i, a_row in enumerate(a):
+            row = result[i]
+            for x, b_row in zip(a_row[start:start + block], b_block):
+                if x:
+                    row = [r + x * y for r, y in zip(row, b_row)]
+            result[i] = row
+    return result
+
+
+def strassen_multiply(a: List[List[MatrixNumber]], b: List[List[MatrixNumber]],
+                      threshold: int) -> List[List[MatrixNumber]]:
+    """
+    Strassen product of matrices given as lists of rows: 7 multiplications of halves instead of 8.
+    Matrices are padded by zeros to square of size s * 2^k, where s <= threshold,
+    and halves not greater than threshold are multiplied by blocked_multiply.
+    :param a: left matrix rows
+    :param b: right matrix rows
+    :param threshold: max size multiplied without splitting
+    :return: rows of product
+    """
+    m, p = len(a), len(b[0])
+    size, levels = max(m, len(b), p), 0
+    while size > threshold:
+        size = (size + 1) // 2
+        levels += 1
+    size <<= levels
+    result = _strassen(_pad(a, size), _pad(b, size), threshold)
+    return [row[:p] for row in result[:m]]
+
+
+def _pad(rows: List[List[MatrixNumber]], size: int) -> List[List[MatrixNumber]]:
+    padded = [row + [0] * (size - len(row)) for row in rows]
+    return padded + [[0] * size for _ in range(size - len(rows))]
+
+
+def _add(a: List[List[MatrixNumber]], b: List[List[MatrixNumber]]) -> List[List[MatrixNumber]]:
+    return [[x + y for x, y in zip(a_row, b_row)] for a_row, b_row in zip(a, b)]
+
+
+def _sub(a: List[List[MatrixNumber]], b: List[List[MatrixNumber]]) -> List[List[MatrixNumber]]:
+    return [[x - y for x, y in zip(a_row, b_row)] for a_row, b_row in zip(a, b)]
+
+
+def _strassen(a: List[List[MatrixNumber]], b: List[List[MatrixNumber]], threshold: int) -> List[List[MatrixNumber]]:
+    n = len(a)
+    if n <= threshold:
+        return blocked_multiply(a, b)
+    h = n // 2
+    a11, a12 = [row[:h] for row in a[:h]], [row[h:] for row in a[:h]]
+    a21, a22 = [row[:h] for row in a[h:]], [row[h:] for row in a[h:]]
+    b11, b12 = [row[:h] for row in b[:h]], [row[h:] for row in b[:h]]
+    b21, b22 = [row[:h] for row in b[h:]], [row[h:] for row in b[h:]]
+    m1 = _strassen(_add(a11, a22), _add(b11, b22), threshold)
+    m2 = _strassen(_add(a21, a22), b11, threshold)
+    m3 = _strassen(a11, _sub(b12, b22), threshold)
+    m4 = _strassen(a22, _sub(b21, b11), threshold)
+    m5 = _strassen(_add(a11, a12), b22, threshold)
+    m6 = _strassen(_sub(a21, a11), _add(b11, b12), threshold)
+    m7 = _strassen(_sub(a12, a22), _add(b21, b22), threshold)
+    c11 = _add(_sub(_add(m1, m4), m5), m7)
+    c12 = _add(m3, m5)
+    c21 = _add(m2, m4)
+    c22 = _add(_add(_sub(m1, m2), m3), m6)
+    return [r1 + r2 for r1, r2 in zip(c11, c12)] + [r1 + r2 for r1, r2 in zip(c21, c22)]
+
+
+def balance(a: List[List[float]]):
+    # similarity scaling by powers of 2, so rows and columns have close norms (reduces rounding errors)
+    n = len(a)
+    done = False
+    while not done:
+        done = True
+        for i in range(n):
+            c = sum(abs(a[j][i]) for j in range(n) if j != i)
+            r = sum(abs(a[i][j]) for j in range(n) if j != i)
+            if not c or not r:
+                continue
+            g, f, s = r / 2, 1.0, c + r
+            while c < g:
+                f *= 2
+                c *= 4
+            g = r * 2
+            while c > g:
+                f /= 2
+                c /= 4
+            if (c + r) / f < 0.95 * s:
+                done = False
+                for j in range(n):
+                    a[i][j] /= f
+                    a[j][i] *= f
+
+
+def hessenberg(a: List[List[float]], deadline: float):
+    # reduction to upper Hessenberg form by elimination with pivoting (similarity transform)
+    n = len(a)
+    for m in range(1, n - 1):
+        if time.monotonic() > deadline:
+            raise CalculationLimitError("Eigenvalues time limit exceeded")
+        x, i = 0.0, m
+        for j in range(m, n):
+            if abs(a[j][m - 1]) > abs(x):
+                x, i = a[j][m - 1], j
+        if i != m:
+            a[i][m - 1:], a[m][m - 1:] = a[m][m - 1:], a[i][m - 1:]
+            for row in a:
+                row[i], row[m] = row[m], row[i]
+        if x:
+            for i in range(m + 1, n):
+                y = a[i][m - 1]
+                if y:
+                    y /= x
+                    a[i][m - 1] = 0.0
+                    a[i][m:] = [p - y * q for p, q in zip(a[i][m:], a[m][m:])]
+                    for row in a:
+                        row[m] += y * row[i]
+
+
+def shifted_qr(a: List[List[float]], deadline: float) -> List[complex]:
+    """
+    Eigenvalues of upper Hessenberg matrix by Francis double shift QR iterations (EISPACK hqr).
+    Subdiagonal elements are checked for negligibility, and found 1x1 or 2x2 blocks are deflated.
+    :param a: rows of Hessenberg matrix (destroyed)
+    :param deadline: time.monotonic() value, after which CalculationLimitError is raised
+    :return: eigenvalues
+    """
+    n = len(a)
+    eig = [0j] * n
+    anorm = sum(abs(a[i][j]) for i in range(n) for j in range(max(i - 1, 0), n))
+    nn = n - 1
+    t = 0.0
+    while nn >= 0:
+        its = 0
+        while True:
+            for l in range(nn, 0, -1):
+                s = abs(a[l - 1][l - 1]) + abs(a[l][l])
+                if s == 0.0:
+                    s = anorm
+                if abs(a[l][l - 1]) + s == s:
+                    a[l][l - 1] = 0.0
+                    break
+            else:
+                l = 0
+            x = a[nn][nn]
+            if l == nn:  # one root found
+                eig[nn] = complex(x + t)
+                nn -= 1
+            else:
+                y = a[nn - 1][nn - 1]
+                w = a[nn][nn - 1] * a[nn - 1][nn]
+                if l == nn - 1:  # two roots found
+                    p = 0.5 * (y - x)
+                    q = p * p + w
+                    z = sqrt(abs(q))
+                    x += t
+                    if q >= 0.0:
+                        z = p + copysign(z, p)
+                        eig[nn - 1] = eig[nn] = complex(x + z)
+                        if z:
+                            eig[nn] = complex(x - w / z)
+                    else:
+                        eig[nn - 1] = complex(x + p, -z)
+                        eig[nn] = complex(x + p, z)
+                    nn -= 2
+                else:
+                    if its == 30:
+                        raise ArithmeticError("QR iterations don't converge")
+                    if time.monotonic() > deadline:
+                        raise CalculationLimitError("Eigenvalues time limit exceeded")
+                    if its == 10 or its == 20:  # exceptional shift
+                        t += x
+                        for i in range(nn + 1):
+                            a[i][i] -= x
+                        s = abs(a[nn][nn - 1]) + abs(a[nn - 1][nn - 2])
+                        y = x = 0.75 * s
+                        w = -0.4375 * s * s
+                    its += 1
+                    for m in range(nn - 2, l - 1, -1):
+                        z = a[m][m]
+                        r = x - z
+                        s = y - z
+                        p = (r * s - w) / a[m + 1][m] + a[m][m + 1]
+                        q = a[m + 1][m + 1] - z - r - s
+                        r = a[m + 2][m + 1]
+                        s = abs(p) + abs(q) + abs(r)
+                        p /= s
+                        q /= s
+                        r /= s
+                        if m == l:
+                            break
+                        u = abs(a[m][m - 1]) * (abs(q) + abs(r))
+                        v = abs(p) * (abs(a[m - 1][m - 1]) + abs(z) + abs(a[m + 1][m + 1]))
+                        if u + v == v:
+                            break
+                    for i in range(m + 2, nn + 1):
+                        a[i][i - 2] = 0.0
+                        if i != m + 2:
+                            a[i][i - 3] = 0.0
+                    for k in range(m, nn):
+                        if k != m:
+                            p = a[k][k - 1]
+                            q = a[k + 1][k - 1]
+                            r = a[k + 2][k - 1] if k != nn - 1 else 0.0
+                            x = abs(p) + abs(q) + abs(r)
+                            if x != 0.0:
+                                p /= x
+                                q /= x
+                                r /= x
+                        s = copysign(sqrt(p * p + q * q + r * r), p)
+                        if s != 0.0:
+                            if k == m:
+                                if l != m:
+                                    a[k][k - 1] = -a[k][k - 1]
+                            else:
+                                a[k][k - 1] = -s * x
+                            p += s
+                            x = p / s
+                            y = q / s
+                            z = r / s
+                            q /= p
+                            r /= p
+                            for j in range(k, nn + 1):
+                                p = a[k][j] + q * a[k + 1][j]
+                                if k != nn - 1:
+                                    p += r * a[k + 2][j]
+                                    a[k + 2][j] -= p * z
+                                a[k + 1][j] -= p * y
+                                a[k][j] -= p * x
+                            for i in range(l, min(nn, k + 3) + 1):
+                                p = x * a[i][k] + y * a[i][k + 1]
+                                if k != nn - 1:
+                                    p += z * a[i][k + 2]
+                                    a[i][k + 2] -= p * r
+                                a[i][k + 1] -= p * q
+                                a[i][k] -= p
+            if nn < 0 or l >= nn - 1:  # C do-while(l < nn-1)
+                break
+    return eig
+
+
+set_backend(Config.MATRIX_BACKEND)
+
+
+def straight_gaussian(matrix: Matrix, additional: Matrix = None) -> "Matrix":
+    if additional is None:
+        additional = type(matrix).zero(matrix.m, 1, exact=matrix.exact)
+    eliminate(matrix, additional)
     return additional
 
 
 def reverse_gaussian(matrix: Matrix, additional: Matrix = None) -> "Matrix":
     if additional is None:
-        additional = Matrix.zero(matrix.m, 1)
+        additional = type(matrix).zero(matrix.m, 1, exact=matrix.exact)
     for k in range(matrix.m - 1, -1, -1):  # Backward (upper right-hand corner jamming)
         divider = matrix[k, k]
-        for j in range(matrix.n):  # leading coefficient = 1
-            matrix[k, j] = matrix[k, j] / divider
-        for j in range(additional.n):
-            additional[k, j] = additional[k, j] / divider
+        matrix.set_row(k, [x / divider for x in matrix.get_row(k)])  # leading coefficient = 1
+        additional.set_row(k, [x / divider for x in additional.get_row(k)])
         for i in range(k - 1, -1, -1):
             leading = matrix[i, k]
             if leading == 0:
                 continue
-            for j in range(matrix.n - 1, -1, -1):
-                matrix[i, j] -= matrix[k, j] * leading
-            for j in range(additional.n - 1, -1, -1):
-                additional[i, j] -= additional[k, j] * leading
+            matrix.subtract_row(i, k, leading)
+            additional.subtract_row(i, k, leading)
     return additional
 
 
@@ -262,7 +1989,7 @@ if __name__ == "__main__":
     print("Licensed under GNU GPL-2.0-or-later")
     m, n = map(int, input("Введите размер матрицы: ").split())
     print("Введите матрицу: ")
-    matrix = [list(map(float, input().split())) for i in range(m)]
-    A = Matrix(m, n)
+    matrix = [list(map(parse_number, input().split())) for i in range(m)]
+    A = Matrix(m, n, exact=all(isinstance(x, Fraction) for row in matrix for x in row))
     A.fill(matrix)
     print(A.ref())
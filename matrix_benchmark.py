@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2021-2023 Ilya Bezrukov, Stepan Chizhov, Artem Grishin
+#
+# This file is part of math_bot.
+#
+# math_bot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+#
+# math_bot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import sys
+import random
+from timeit import timeit
+
+from matrix import blocked_multiply, strassen_multiply
+
+
+def random_rows(n: int) -> list:
+    return [[random.uniform(-1, 1) for _ in range(n)] for _ in range(n)]
+
+
+def measure(func, *args, repeat: int = 3) -> float:
+    return min(timeit(lambda: func(*args), number=1) for _ in range(repeat))
+
+
+if __name__ == "__main__":
+    print("Copyright (C) 2021-2023 Ilya Bezrukov, Stepan Chizhov, Artem Grishin")
+    print("Licensed under GNU GPL-2.0-or-later")
+    # Strassen with threshold n / 2 makes exactly one split of n x n matrices,
+    # so the last size where it still loses is a good value for STRASSEN_THRESHOLD
+    sizes = [int(x) for x in sys.argv[1:]] or [32, 64, 96, 128, 192, 256, 384]
+    threshold = crossover = None
+    print(f"{'size':>6}{'blocked, s':>14}{'strassen, s':>14}")
+    for n in sizes:
+        a, b = random_rows(n), random_rows(n)
+        blocked = measure(blocked_multiply, a, b)
+        strassen = measure(strassen_multiply, a, b, n // 2)
+        print(f"{n:>6}{blocked:>14.4f}{strassen:>14.4f}")
+        if crossover is None:
+            if strassen < blocked:
+                crossover = n
+            else:
+                threshold = n
+    if crossover is None:
+        print("Strassen multiplication is slower on all measured sizes")
+    else:
+        print(f"Crossover: {crossover}, recommended STRASSEN_THRESHOLD={threshold or crossover // 2}")
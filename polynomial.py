@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2021-2023 Ilya Bezrukov, Stepan Chizhov, Artem Grishin
+#
+# This file is part of math_bot.
+#
+# math_bot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# any later version.
+#
+# math_bot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import re
+from typing import Tuple, List, Iterable, Optional, Union
+
+from rings import find_inverse
+
+
+class ModuloMatchError (ValueError):
+    pass
+
+
+class PolynomialTooLarge (ValueError):
+    pass
+
+
+KRONECKER_THRESHOLD = 32  # shorter polynomials are multiplied by schoolbook method
+NEWTON_THRESHOLD = 64  # quotients of this length and greater are found by Newton iterations
+HALF_GCD_THRESHOLD = 64  # polynomials of this degree and greater are reduced by half-GCD
+
+TERM = re.compile(r"([+-])?(\d+)?(?:(x)(?:\^(\d+))?)?")
+
+
+class Polynomial:
+    """
+    Polynomial with coefficients in Z/n. Coefficients are kept from constant term, without trailing zeros.
+    Division requires invertible leading coefficient of divisor (always true for prime n),
+    otherwise ArithmeticError is raised.
+    """
+
+    __slots__ = ("coefficients", "modulo")
+
+    def __init__(self, coefficients: Iterable[int], modulo: int):
+        self.coefficients = trim([c % modulo for c in coefficients])
+        self.modulo = modulo
+
+    @property
+    def degree(self) -> int:  # -1 for zero polynomial
+        return len(self.coefficients) - 1
+
+    @property
+    def leading(self) -> int:
+        return self.coefficients[-1] if self.coefficients else 0
+
+    def new(self, coefficients: List[int]) -> "Polynomial":
+        # polynomial over the same ring from reduced coefficients
+        result = Polynomial.__new__(Polynomial)
+        result.coefficients = trim(coefficients)
+        result.modulo = self.modulo
+        return result
+
+    def check_modulo(self, other: "Polynomial"):
+        if other.modulo != self.modulo:
+            raise ModuloMatchError("Polynomials must be defined over the same ring")
+
+    def __bool__(self) -> bool:
+        return bool(self.coefficients)
+
+    def __eq__(self, other: "Polynomial") -> bool:
+        return (isinstance(other, Polynomial) and self.modulo == other.modulo
+                and self.coefficients == other.coefficients)
+
+    def __repr__(self) -> str:
+        return f"Polynomial({self.coefficients}, {self.modulo})"
+
+    def __add__(self, other: "Polynomial") -> "Polynomial":
+        self.check_modulo(other)
+        a, b = self.coefficients, other.coefficients
+        if len(a) < len(b):
+            a, b = b, a
+        n = self.modulo
+        return self.new([(x + y) % n for x, y in zip(a, b)] + a[len(b):])
+
+    def __neg__(self) -> "Polynomial":
+        n = self.modulo
+        return self.new([-x % n for x in self.coefficients])
+
+    def __sub__(self, other: "Polynomial") -> "Polynomial":
+        return self + -other
+
+    def __mul__(self, other: Union["Polynomial", int]) -> "Polynomial":
+        if isinstance(other, int):
+            n = self.modulo
+            return self.new([x * other % n for x in self.coefficients])
+        self.check_modulo(other)
+        return self.new(multiply(self.coefficients, other.coefficients, self.modulo))
+
+    __rmul__ = __mul__
+
+    def __rshift__(self, k: int) -> "Polynomial":  # quotient by x^k
+        return self.new(self.coefficients[k:])
+
+    def truncate(self, k: int) -> "Polynomial":  # remainder by x^k
+        return self.new(self.coefficients[:k])
+
+    def __divmod__(self, other: "Polynomial") -> Tuple["Polynomial", "Polynomial"]:
+        self.check_modulo(other)
+        if not other:
+            raise ZeroDivisionError("Division by zero polynomial")
+        if self.degree < other.degree:
+            return self.new([]), self
+        if self.degree - other.degree + 1 < NEWTON_THRESHOLD or other.degree < 1:
+            quotient, remainder = divide(self.coefficients, other.coefficients, self.modulo)
+            return self.new(quotient), self.new(remainder)
+        # reversed polynomials: rev(a) = rev(q) rev(b) (mod x^k), where k is length of quotient
+        k = self.degree - other.degree + 1
+        divisor = other.coefficients[::-1]
+        inverse = inverse_series(divisor[:k], k, self.modulo)
+        quotient = self.new(multiply(self.coefficients[::-1][:k], inverse, self.modulo)[:k][::-1])
+        return quotient, (self - quotient * other).truncate(other.degree)
+
+    def __floordiv__(self, other: "Polynomial") -> "Polynomial":
+        return divmod(self, other)[0]
+
+    def __mod__(self, other: "Polynomial") -> "Polynomial":
+        return divmod(self, other)[1]
+
+    def __call__(self, x: int) -> int:
+        # Horner's method
+        n = self.modulo
+        value = 0
+        for c in reversed(self.coefficients):
+            value = (value * x + c) % n
+        return value
+
+    def monic(self) -> "Polynomial":
+        return self * find_inverse(self.leading, self.modulo) if self else self
+
+    def gcd(self, other: "Polynomial") -> "Polynomial":
+        """
+        Greatest common divisor (monic)
+        :param other: polynomial
+        :return: gcd, zero if both polynomials are zero
+        """
+        self.check_modulo(other)
+        return euclid(self, other, cofactors=False)[0].monic()
+
+    def ext_gcd(self, other: "Polynomial") -> Tuple["Polynomial", "Polynomial", "Polynomial"]:
+        """
+        Greatest common divisor and Bezout coefficients
+        :param other: polynomial
+        :return: tuple of monic gcd, u and v with u * self + v * other = gcd
+        """
+        self.check_modulo(other)
+        d, (u, v, _, _) = euclid(self, other, cofactors=True)
+        if not d:
+            return d, u, v
+        inverse = find_inverse(d.leading, self.modulo)
+        return d * inverse, u * inverse, v * inverse
+
+    def inverse(self, modulus: "Polynomial") -> "Polynomial":
+        """
+        Inverse element in ring of polynomials modulo given one. ArithmeticError is raised if it not exists.
+        :param modulus: polynomial of positive degree
+        :return: u with u * self = 1 (mod modulus)
+        """
+        d, u, _ = self.ext_gcd(modulus)
+        if d.degree != 0:
+            raise ArithmeticError("Polynomials are not coprime. Inverse not exists!")
+        return u % modulus
+
+    @classmethod
+    def parse(cls, text: str, modulo: int, max_degree: Optional[int] = None) -> "Polynomial":
+        """
+        Read polynomial: coefficients separated by spaces (from the highest power) or sum of terms like 3x^2
+        :param text: string representation
+        :param modulo: ring modulo
+        :param max_degree: PolynomialTooLarge is raised for greater degree
+        :return: polynomial
+        """
+        text = text.strip()
+        if re.fullmatch(r"-?\d+(\s+-?\d+)*", text):
+            coefficients = [int(x) for x in reversed(text.split())]
+            if max_degree is not None and len(coefficients) > max_degree + 1:
+                raise PolynomialTooLarge(f"Degree must be not greater than {max_degree}")
+            return cls(coefficients, modulo)
+        if re.search(r"\d\s+\d", text):
+            raise ValueError("Terms must be separated by sign")
+        text = re.sub(r"[\s*]", "", text)
+        terms = {}
+        position = 0
+        while position < len(text):
+            match = TERM.match(text, position)
+            sign, coefficient, x, power = match.groups()
+            if (coefficient is None and x is None) or (position and sign is None):
+                raise ValueError(f"Invalid term at pos {position}")
+            degree = (int(power) if power else 1) if x else 0
+            if max_degree is not None and degree > max_degree:
+                raise PolynomialTooLarge(f"Degree must be not greater than {max_degree}")
+            value = int(coefficient) if coefficient else 1
+            terms[degree] = terms.get(degree, 0) + (-value if sign == "-" else value)
+            position = match.end()
+        if not terms:
+            raise ValueError("Polynomial is empty")
+        coefficients = [0] * (max(terms) + 1)
+        for degree, value in terms.items():
+            coefficients[degree] = value
+        return cls(coefficients, modulo)
+
+
+Matrix2x2 = Tuple[Polynomial, Polynomial, Polynomial, Polynomial]
+
+
+def trim(coefficients: List[int]) -> List[int]:
+    while coefficients and not coefficients[-1]:
+        coefficients.pop()
+    return coefficients
+
+
+def multiply(a: List[int], b: List[int], n: int) -> List[int]:
+    """
+    Product of polynomials with coefficients 0 <= c < n: schoolbook method for short ones,
+    Kronecker substitution for others
+    :return: coefficients of product
+    """
+    if not a or not b:
+        return []
+    if min(len(a), len(b)) < KRONECKER_THRESHOLD:
+        result = [0] * (len(a) + len(b) - 1)
+        for i, x in enumerate(a):
+            if x:
+                for j, y in enumerate(b):
+                    result[i + j] += x * y
+        return [c % n for c in result]
+    return kronecker_multiply(a, b, n)
+
+
+def kronecker_multiply(a: List[int], b: List[int], n: int) -> List[int]:
+    """
+    Kronecker substitution: coefficients are packed into long integers as digits in base 2^(8w),
+    which is greater than any coefficient of product, so one long multiplication
+    (Karatsuba and Toom-Cook inside of Python) gives all of them
+    :return: coefficients of product
+    """
+    width = (2 * (n - 1).bit_length() + min(len(a), len(b)).bit_length() + 7) // 8
+
+    def pack(coefficients):
+        return int.from_bytes(b"".join(c.to_bytes(width, "little") for c in coefficients), "little")
+
+    x = pack(a)
+    product = x * x if a is b else x * pack(b)
+    data = product.to_bytes((len(a) + len(b) - 1) * width, "little")
+    return [int.from_bytes(data[i:i + width], "little") % n for i in range(0, len(data), width)]
+
+
+def divide(a: List[int], b: List[int], n: int) -> Tuple[List[int], List[int]]:
+    # schoolbook division, b has invertible leading coefficient
+    inverse = find_inverse(b[-1], n)
+    remainder = a[:]
+    quotient = [0] * (len(a) - len(b) + 1)
+    for i in range(len(a) - len(b), -1, -1):
+        c = remainder[i + len(b) - 1] * inverse % n
+        quotient[i] = c
+        if c:
+            for j, y in enumerate(b):
+                remainder[i + j] = (remainder[i + j] - c * y) % n
+    return quotient, remainder[:len(b) - 1]
+
+
+def inverse_series(f: List[int], k: int, n: int) -> List[int]:
+    """
+    Inverse power series modulo x^k by Newton iterations g = g (2 - f g), precision is doubled by each one
+    :param f: series with invertible constant term
+    :param k: precision
+    :param n: ring modulo
+    :return: coefficients of g with f g = 1 (mod x^k)
+    """
+    g = [find_inverse(f[0], n)]
+    precision = 1
+    while precision < k:
+        precision = min(2 * precision, k)
+        e = [-c % n for c in multiply(f[:precision], g, n)[:precision]]
+        e += [0] * (precision - len(e))
+        e[0] = (e[0] + 2) % n
+        g = multiply(g, e, n)[:precision]
+    return g
+
+
+def apply(matrix: Matrix2x2, a: Polynomial, b: Polynomial) -> Tuple[Polynomial, Polynomial]:
+    m00, m01, m10, m11 = matrix
+    return m00 * a + m01 * b, m10 * a + m11 * b
+
+
+def compose(s: Matrix2x2, r: Matrix2x2) -> Matrix2x2:
+    s00, s01, s10, s11 = s
+    r00, r01, r10, r11 = r
+    return s00 * r00 + s01 * r10, s00 * r01 + s01 * r11, s10 * r00 + s11 * r10, s10 * r01 + s11 * r11
+
+
+def identity(modulo: int) -> Matrix2x2:
+    zero, one = Polynomial([], modulo), Polynomial([1], modulo)
+    return one, zero, zero, one
+
+
+def euclid_step(q: Polynomial) -> Matrix2x2:
+    # (a, b) -> (b, a - q b)
+    zero, one = Polynomial([], q.modulo), Polynomial([1], q.modulo)
+    return zero, one, one, -q
+
+
+def half_gcd(a: Polynomial, b: Polynomial) -> Matrix2x2:
+    """
+    Half-GCD: matrix of Euclid steps, which reduce pair (a, b) with deg a > deg b to (c, d) with
+    deg c >= m > deg d, m = ceil(deg a / 2). Quotients depend only on high coefficients,
+    so the first half of steps is found recursively from a / x^m and b / x^m, O(M(n) log n).
+    :param a: polynomial
+    :param b: polynomial of less degree
+    :return: matrix of Euclid steps
+    """
+    m = (a.degree + 1) // 2
+    if a.degree < HALF_GCD_THRESHOLD:
+        # plain steps for small polynomials
+        r = identity(a.modulo)
+        while b.degree >= m:
+            q, remainder = divmod(a, b)
+            a, b = b, remainder
+            r = compose(euclid_step(q), r)
+        return r
+    if b.degree < m:
+        return identity(a.modulo)
+    r = half_gcd(a >> m, b >> m)
+    c, d = apply(r, a, b)
+    if d.degree < m:
+        return r
+    q, remainder = divmod(c, d)
+    r = compose(euclid_step(q), r)
+    k = 2 * m - d.degree
+    return compose(half_gcd(d >> k, remainder >> k), r)
+
+
+def euclid(a: Polynomial, b: Polynomial, cofactors: bool) -> Tuple[Polynomial, Matrix2x2]:
+    """
+    Euclid algorithm, large polynomials are reduced by half-GCD
+    :param a: polynomial
+    :param b: polynomial
+    :param cofactors: track matrix of steps
+    :return: last nonzero remainder and matrix (u, v, s, t) with u a + v b = remainder
+    """
+    matrix = identity(a.modulo)
+    if a.degree < b.degree:
+        a, b = b, a
+        matrix = euclid_step(Polynomial([], a.modulo))
+    while b:
+        q, remainder = divmod(a, b)
+        a, b = b, remainder
+        if cofactors:
+            matrix = compose(euclid_step(q), matrix)
+        if b.degree >= HALF_GCD_THRESHOLD and 2 * b.degree > a.degree:  # now deg a > deg b
+            r = half_gcd(a, b)
+            a, b = apply(r, a, b)
+            if cofactors:
+                matrix = compose(r, matrix)
+    return a, matrix
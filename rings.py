@@ -18,9 +18,18 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 from typing import *
-from functools import reduce, lru_cache
-from math import gcd
-from itertools import product
+from collections.abc import Sequence
+from functools import lru_cache
+from math import gcd, isqrt, lcm
+from itertools import count
+from array import array
+import mmap
+import os
+import threading
+import time
+
+from config import Config
+from shunting_yard import CalculationLimitError
 
 
 def sgn(a: int):
@@ -54,24 +63,297 @@ def ext_gcd(a: int, b: int) -> Tuple[int, int, int]:
     return d, x * _a, y * _b
 
 
+TRIAL_DIVISION_LIMIT = 1000
+SMALL_PRIMES = [p for p in range(2, TRIAL_DIVISION_LIMIT) if all(p % d for d in range(2, isqrt(p) + 1))]
+
+
+class SmallestPrimeFactors:
+    """
+    Table of smallest prime factors of odd numbers below limit, stored in file and memory-mapped,
+    so it is built once and its pages are shared by all processes of the bot.
+    Element i is the smallest prime factor of 2i + 1 or 0 if this number is prime.
+    Composite n < 2^32 has factor below 2^16, so two bytes per odd number are enough.
+    """
+
+    segment_size = 1 << 20  # odd numbers sieved at once
+
+    def __init__(self, path: str, limit: int):
+        self.path = path
+        self.limit = min(limit, 1 << 32)
+        self.table = None
+        self.lock = threading.Lock()  # bot handlers run in several threads
+
+    def __contains__(self, n: int) -> bool:
+        return 0 < n < self.limit
+
+    def open(self) -> memoryview:
+        if self.table is None:
+            with self.lock:
+                if self.table is None:  # table could be opened by other thread while waiting for lock
+                    size = self.limit // 2 * 2
+                    if not os.path.exists(self.path) or os.path.getsize(self.path) != size:
+                        self.build()
+                    with open(self.path, "rb") as file:
+                        self.table = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)).cast("H")
+        return self.table
+
+    def build(self):
+        """
+        Segmented sieve of Eratosthenes: odd multiples of primes up to sqrt(limit) are marked in every segment.
+        Primes are taken in decreasing order, so the smallest one is written last.
+        """
+        base = bytearray([1]) * (isqrt(self.limit) + 1)
+        base[:2] = b"\0\0"
+        for p in range(2, isqrt(len(base)) + 1):
+            if base[p]:
+                base[p * p::p] = bytes(len(range(p * p, len(base), p)))
+        primes = [p for p in range(len(base) - 1, 2, -1) if base[p]]
+        temporary = f"{self.path}.{os.getpid()}"
+        with open(temporary, "wb") as file:
+            total = self.limit // 2
+            for offset in range(0, total, self.segment_size):
+                size = min(self.segment_size, total - offset)
+                low, high = 2 * offset + 1, 2 * (offset + size) + 1  # segment of odd numbers low + 2i
+                segment = array("H", bytes(2 * size))
+                for p in primes:
+                    start = max(p * p, (low + p - 1) // p * p)
+                    if start % 2 == 0:
+                        start += p
+                    if start < high:
+                        first = (start - low) // 2
+                        segment[first::p] = array("H", [p]) * len(range(first, len(segment), p))
+                segment.tofile(file)
+        os.replace(temporary, self.path)  # other processes see only complete table
+
+    def factorize(self, n: int) -> Dict[int, int]:
+        table = self.open()
+        primes = {}
+        if n % 2 == 0:
+            k = (n & -n).bit_length() - 1
+            primes[2] = k
+            n >>= k
+        while n > 1:
+            p = table[n >> 1] or n
+            primes[p] = primes.get(p, 0) + 1
+            n //= p
+        return primes
+
+
+smallest_prime_factors = SmallestPrimeFactors(Config.SPF_TABLE_PATH, Config.SPF_TABLE_LIMIT)
+
+
 @lru_cache
-def factorize(n: int) -> Dict[int, int]:
+def factorize(n: int, time_limit: Optional[float] = None) -> Dict[int, int]:
     """
     Factorize number in product of prime numbers
     :param n: number
+    :param time_limit: seconds for Pollard's rho, CalculationLimitError is raised if they are over (no limit by default)
     :return: factorization in dict of (p, k), where p - prime number, k - it's power.
     """
-    d = 2
+    return factorize_before(n, None if time_limit is None else time.monotonic() + time_limit)
+
+
+def factorize_range(a: int, b: int, time_limit: Optional[float] = None) -> Iterator[Tuple[int, Dict[int, int]]]:
+    """
+    Factorize consecutive numbers
+    :param a: first number
+    :param b: last number
+    :param time_limit: seconds for all numbers, CalculationLimitError is raised if they are over (no limit by default)
+    :return: generator of pairs number, factorization
+    """
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+    for n in range(a, b + 1):
+        yield n, factorize_before(n, deadline)
+
+
+def factorize_before(n: int, deadline: Optional[float]) -> Dict[int, int]:
+    """
+    Factorize number: numbers below SPF_TABLE_LIMIT by table of smallest prime factors,
+    others by trial division by small primes, then Brent's variant of Pollard's rho splits
+    composite cofactors (about n^(1/4) steps)
+    :param n: number
+    :param deadline: time.monotonic() value, after which CalculationLimitError is raised (None for no limit)
+    :return: factorization in dict of (p, k), where p - prime number, k - it's power.
+    """
+    if n in smallest_prime_factors:
+        return dict(sorted(smallest_prime_factors.factorize(n).items()))
     primes = {}
-    while n > 1:
-        if n % d == 0:
-            primes[d] = primes.get(d, 0) + 1
-            n //= d
-        elif d * d > n:
-            d = n
+    for p in SMALL_PRIMES:
+        if p * p > n:
+            break
+        while n % p == 0:
+            primes[p] = primes.get(p, 0) + 1
+            n //= p
+    composites = [n] if n > 1 else []
+    while composites:
+        n = composites.pop()
+        if n in smallest_prime_factors:
+            for p, k in smallest_prime_factors.factorize(n).items():
+                primes[p] = primes.get(p, 0) + k
+        # cofactors have no prime divisors less than TRIAL_DIVISION_LIMIT
+        elif n < TRIAL_DIVISION_LIMIT ** 2 or is_prime(n):
+            primes[n] = primes.get(n, 0) + 1
         else:
-            d += 1
-    return primes
+            root, k = perfect_power(n)  # Pollard's rho is slow for p^k: it needs about sqrt(p) steps
+            if k > 1:
+                composites += [root] * k
+            else:
+                d = pollard_brent(n, deadline)
+                composites += [d, n // d]
+    return dict(sorted(primes.items()))
+
+
+def integer_root(n: int, k: int) -> int:
+    """
+    Integer k-th root (Newton's method)
+    :param n: non-negative number
+    :param k: root degree
+    :return: the greatest x with x^k <= n
+    """
+    if n < 2:
+        return n
+    x = 1 << -(-n.bit_length() // k)  # x >= root
+    while True:
+        y = ((k - 1) * x + n // x ** (k - 1)) // k
+        if y >= x:
+            return x
+        x = y
+
+
+def perfect_power(n: int) -> Tuple[int, int]:
+    """
+    Represent number as perfect power with the greatest exponent
+    :param n: number without prime divisors less than TRIAL_DIVISION_LIMIT
+    :return: root and exponent, (n, 1) if n is not a perfect power
+    """
+    k = 2
+    while TRIAL_DIVISION_LIMIT ** k <= n:
+        root = integer_root(n, k)
+        if root ** k == n:
+            base, power = perfect_power(root)
+            return base, power * k
+        k += 1
+    return n, 1
+
+
+def pollard_brent(n: int, deadline: Optional[float] = None) -> int:
+    """
+    Find nontrivial divisor of composite number (Pollard's rho with Brent's cycle detection).
+    Differences of sequence x -> x^2 + c are multiplied in batches, so gcd is taken once per batch.
+    :param n: odd composite number
+    :param deadline: time.monotonic() value, after which CalculationLimitError is raised
+    :return: divisor 1 < d < n
+    """
+    batch = 128
+    for c in count(1):
+        y, r, q, d = 2, 1, 1, 1
+        while d == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and d == 1:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise CalculationLimitError("Factorization takes too long")
+                ys = y
+                for _ in range(min(batch, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                d = gcd(q, n)
+                k += batch
+            r *= 2
+        if d == n:  # batch contains several divisors, repeat it by one step
+            d = 1
+            while d == 1:
+                ys = (ys * ys + c) % n
+                d = gcd(abs(x - ys), n)
+        if d != n:
+            return d
+
+
+def jacobi(a: int, n: int) -> int:
+    """
+    Jacobi symbol (a/n)
+    :param a: integer number
+    :param n: odd positive number
+    :return: -1, 0 or 1
+    """
+    a %= n
+    result = 1
+    while a:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+
+def is_lucas_prime(n: int) -> bool:
+    """
+    Strong Lucas probable prime test with Selfridge parameters
+    :param n: odd number, which is not a perfect square
+    :return: False if n is composite
+    """
+    d = 5
+    while jacobi(d, n) != -1:
+        d = -d - 2 if d > 0 else -d + 2
+    p, q = 1, (1 - d) // 4
+    k, s = n + 1, 0
+    while k % 2 == 0:
+        k //= 2
+        s += 1
+
+    def half(x):
+        return (x + n if x % 2 else x) // 2 % n
+
+    u, v, qk = 1, p, q % n  # U_1, V_1, Q^1
+    for bit in bin(k)[3:]:
+        u, v, qk = u * v % n, (v * v - 2 * qk) % n, qk * qk % n
+        if bit == "1":
+            u, v, qk = half(p * u + v), half(d * u + p * v), qk * q % n
+    if u == 0 or v == 0:
+        return True
+    for _ in range(s - 1):
+        v, qk = (v * v - 2 * qk) % n, qk * qk % n
+        if v == 0:
+            return True
+    return False
+
+
+def is_prime(n: int) -> bool:
+    """
+    Miller-Rabin primality test: deterministic for n < 3.3 * 10^24 (first 13 prime bases are enough),
+    greater numbers are also checked by strong Lucas test (Baillie-PSW, no counterexamples are known)
+    :param n: number
+    :return: True if n is prime
+    """
+    if n < 2:
+        return False
+    bases = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+    for p in bases:
+        if n % p == 0:
+            return n == p
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for a in bases:
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    if n < 3317044064679887385961981:
+        return True
+    return isqrt(n) ** 2 != n and is_lucas_prime(n)
 
 
 def defactorize(factorization: Dict[int, int]) -> int:
@@ -108,56 +390,410 @@ def find_inverse(a: int, n: int) -> int:
     return ia % n
 
 
-def solve_comparisons(comparisons: Dict[int, int]):
+def find_inverses(elements: Sequence[int], n: int) -> List[Optional[int]]:
+    """
+    Find modular inverses for many elements by Montgomery's trick: inverse of product of all elements
+    (single extended Euclid) is multiplied by prefix products, 3(k - 1) multiplications in total
+    :param elements: reversible elements
+    :param n: ring modulo
+    :return: modular inverses, None for elements, which have no inverse
+    """
+    elements = [a % n for a in elements]
+    prefix = []
+    product = 1
+    for a in elements:
+        product = product * a % n
+        prefix.append(product)
+    if gcd(product, n) != 1:  # skip irreversible elements
+        reversible = [gcd(a, n) == 1 for a in elements]
+        inverses = iter(find_inverses([a for a, r in zip(elements, reversible) if r], n))
+        return [next(inverses) if r else None for r in reversible]
+    result = [0] * len(elements)
+    inverse = find_inverse(product, n)  # inverse of a_0 * ... * a_i
+    for i in range(len(elements) - 1, 0, -1):
+        result[i] = inverse * prefix[i - 1] % n
+        inverse = inverse * elements[i] % n
+    if elements:
+        result[0] = inverse
+    return result
+
+
+def solve_comparisons(comparisons: Union[Dict[int, int], Iterable[Tuple[int, int]]]) -> Tuple[int, int]:
     """
-    Solve comparisons with Chinese remainder theorem.
-    :param comparisons: dict with pairs modulo: reminder
-    :return: tuple of the least answer for comparisons and modules product
+    Solve comparisons with Chinese remainder theorem. Comparisons are merged one by one:
+    x = z (mod M) and x = r (mod m) give z + M * t, where t * M = r - z (mod m) is solved modulo m / gcd(M, m),
+    so extended Euclid works with numbers less than m. Modules may be not relative prime.
+    ArithmeticError is raised if comparisons are incompatible.
+    :param comparisons: dict or pairs modulo: reminder
+    :return: tuple of the least answer for comparisons and least common multiple of modules
     """
-    modules_gcd = reduce(gcd, comparisons.keys())
-    if modules_gcd != 1 and len(comparisons) != 1:
-        raise ArithmeticError("Modules must be relative prime numbers!")
-    modules_product = reduce(lambda _a, _b: _a * _b, comparisons.keys())
-    partial_products = [modules_product // x for x in comparisons.keys()]
-    z = 0
-    for x, pp, m in zip(comparisons.values(), partial_products, comparisons.keys()):
-        z += x * pp * find_inverse(pp, m)
-    return z % modules_product, modules_product
+    pairs = comparisons.items() if isinstance(comparisons, dict) else comparisons
+    z, product = 0, 1
+    for m, r in pairs:
+        d, inverse, _ = ext_gcd(product % m, m)
+        difference = (r - z) % m
+        if difference % d:
+            raise ArithmeticError(f"Comparisons x = {r} (mod {m}) and x = {z} (mod {product}) are incompatible!")
+        m //= d
+        z += product * (difference // d * inverse % m)
+        product *= m
+    return z, product
 
 
-def find_nilpotents(n: int) -> list:
+def find_nilpotents(n: int) -> range:
     """
-    Find all nilpotents in ring of modulo n
+    Find all nilpotents in ring of modulo n: multiples of rad(n), the product of prime divisors of n
     :param n: ring modulo
-    :return: list of all nilpotent elements
+    :return: range of all nilpotent elements (O(1) length, indexing, slicing and membership)
     """
-    result = []
     fn = factorize(n)
     np = defactorize({k: 1 for k, v in fn.items()})
-    count = n // np
-    for i in range(count):
-        result.append(np * i)
-    return result
+    return range(0, n, np)
+
+
+class Idempotents (Sequence):
+    """
+    Idempotents of Z/n: e = x_1 e_1 + ... + x_k e_k (mod n) for 0/1 vectors x, where primitive idempotent e_j
+    is 1 modulo p_j^k_j and 0 modulo other prime powers of n. Vectors are enumerated in Gray code order,
+    so every next element differs from previous one by addition or subtraction of single e_j.
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        self.factored_rings = [p ** k for p, k in factorize(n).items()]
+        self.basis = []
+        for modulo in self.factored_rings:
+            c = n // modulo
+            self.basis.append(c * find_inverse(c, modulo) % n)
 
+    def __len__(self) -> int:
+        return 1 << len(self.factored_rings)
 
-def find_idempotents(n: int) -> list:
+    def vector(self, code: int) -> Tuple[int, ...]:
+        return tuple(code >> j & 1 for j in range(len(self.factored_rings)))
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step == 1:
+                return list(self.enumerate(start, stop))
+            return [self[i] for i in range(start, stop, step)]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("Idempotent index out of range")
+        code = item ^ item >> 1
+        return self.vector(code), sum(e for j, e in enumerate(self.basis) if code >> j & 1) % self.n
+
+    def __contains__(self, item) -> bool:
+        element, e = item
+        return (len(element) == len(self.factored_rings) and set(element) <= {0, 1}
+                and sum(x * b for x, b in zip(element, self.basis)) % self.n == e)
+
+    def __iter__(self) -> Iterator[Tuple[Tuple[int, ...], int]]:
+        return self.enumerate(0, len(self))
+
+    def enumerate(self, start: int, stop: int) -> Iterator[Tuple[Tuple[int, ...], int]]:
+        if start >= stop:
+            return
+        element, e = self[start]
+        code = start ^ start >> 1
+        yield element, e
+        for i in range(start + 1, stop):
+            j = (i & -i).bit_length() - 1  # Gray codes of i - 1 and i differ in the lowest set bit of i
+            code ^= 1 << j
+            if code >> j & 1:
+                e += self.basis[j]
+                if e >= self.n:
+                    e -= self.n
+            else:
+                e -= self.basis[j]
+                if e < 0:
+                    e += self.n
+            yield self.vector(code), e
+
+
+def find_idempotents(n: int) -> Idempotents:
     """
     Find all idempotents in ring of modulo n
     :param n: ring modulo
-    :return: list of all idempotent elements
+    :return: lazy sequence of pairs (0/1 vector of residues modulo prime powers of n, idempotent element)
     """
-    result = []
-    fn = factorize(n)
-    factored_rings = []
-    for p, k in fn.items():
-        factored_rings.append(p ** k)
-    rings_count = len(factored_rings)
-    for element in product((0, 1), repeat=rings_count):
-        e, _ = solve_comparisons({modulo: reminder for modulo, reminder in zip(factored_rings, element)})
-        result.append((element, e))
+    return Idempotents(n)
+
+
+def tonelli_shanks(a: int, p: int) -> int:
+    """
+    Square root modulo odd prime (Tonelli-Shanks algorithm). a must be quadratic residue.
+    :param a: quadratic residue modulo p
+    :param p: odd prime
+    :return: x with x^2 = a (mod p)
+    """
+    a %= p
+    q, s = p - 1, 0
+    while q % 2 == 0:
+        q //= 2
+        s += 1
+    z = 2
+    while pow(z, (p - 1) // 2, p) != p - 1:  # quadratic non-residue
+        z += 1
+    c, x, t, m = pow(z, q, p), pow(a, (q + 1) // 2, p), pow(a, q, p), s
+    while t not in (0, 1):
+        i, t2 = 0, t
+        while t2 != 1:
+            t2 = t2 * t2 % p
+            i += 1
+        b = pow(c, 1 << (m - i - 1), p)
+        x, c, m = x * b % p, b * b % p, i
+        t = t * c % p
+    return x if t else 0
+
+
+def unit_square_roots(u: int, p: int, e: int) -> List[int]:
+    """
+    Square roots of invertible element modulo p^e: root modulo p is lifted by Hensel's lemma
+    (Newton iteration doubles precision), for p = 2 bit by bit
+    :param u: element not divisible by p
+    :param p: prime
+    :param e: power
+    :return: all roots modulo p^e (2 for odd p, up to 4 for p = 2)
+    """
+    q = p ** e
+    if p == 2:
+        if u % min(q, 8) != 1 % q:
+            return []
+        if e < 3:
+            return [x for x in range(1, q, 2) if x * x % q == u % q]
+        r = 1
+        for i in range(3, e):
+            if (r * r - u) % (1 << (i + 1)):
+                r += 1 << (i - 1)
+        return sorted({r, q - r, (r + q // 2) % q, (q // 2 - r) % q})
+    if pow(u, (p - 1) // 2, p) != 1:
+        return []
+    r, precision = tonelli_shanks(u, p), 1
+    while precision < e:
+        precision = min(2 * precision, e)
+        modulo = p ** precision
+        r = (r - (r * r - u) * find_inverse(2 * r, modulo)) % modulo
+    return [r, q - r]
+
+
+def prime_power_square_roots(a: int, p: int, k: int) -> Tuple[List[int], int, int]:
+    """
+    Square roots of a modulo p^k. If a = p^v * u and v < k, v must be even and roots are
+    x = p^(v/2) * y + p^(k - v/2) * t, where y^2 = u (mod p^(k - v)) and t < p^(v/2).
+    If a = 0, roots are multiples of p^ceil(k/2).
+    :param a: element
+    :param p: prime
+    :param k: power
+    :return: roots as bases modulo p^m, step p^m and count of steps: b + t * p^m for 0 <= t < count
+    """
+    q = p ** k
+    a %= q
+    if a == 0:
+        m = (k + 1) // 2
+        return [0], p ** m, p ** (k - m)
+    v = 0
+    while a % p == 0:
+        a //= p
+        v += 1
+    if v % 2:
+        return [], q, 1
+    j = v // 2
+    return [p ** j * y for y in unit_square_roots(a, p, k - v)], p ** (k - j), p ** j
+
+
+class SquareRoots (Sequence):
+    """
+    All square roots of a modulo n: roots modulo prime powers of n are glued by CRT with primitive idempotents,
+    x = x_1 e_1 + ... + x_k e_k (mod n). Roots are produced lazily by mixed radix index,
+    because their count is product of counts for every prime power.
+    """
+
+    def __init__(self, a: int, n: int):
+        self.a = a % n
+        self.n = n
+        self.basis = Idempotents(n).basis
+        self.roots = [prime_power_square_roots(a, p, k) for p, k in factorize(n).items()]
+
+    def __len__(self) -> int:
+        result = 1
+        for bases, step, count in self.roots:
+            result *= len(bases) * count
+        return result
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("Square root index out of range")
+        x = 0
+        for (bases, step, count), e in zip(self.roots, self.basis):
+            item, i = divmod(item, len(bases) * count)
+            x += (bases[i % len(bases)] + step * (i // len(bases))) * e
+        return x % self.n
+
+    def __contains__(self, x) -> bool:
+        return isinstance(x, int) and 0 <= x < self.n and x * x % self.n == self.a
+
+
+def sqrt_mod(a: int, n: int) -> SquareRoots:
+    """
+    Find all square roots of a modulo n (Tonelli-Shanks, Hensel lifting and CRT)
+    :param a: element
+    :param n: ring modulo
+    :return: lazy sequence of x with x^2 = a (mod n), empty if a is not a quadratic residue
+    """
+    return SquareRoots(a, n)
+
+
+def euler_phi(n: int) -> int:
+    """
+    Euler's totient function: count of invertible elements in ring of modulo n
+    :param n: ring modulo
+    :return: phi(n)
+    """
+    for p in factorize(n):
+        n = n // p * (p - 1)
+    return n
+
+
+def carmichael(n: int) -> int:
+    """
+    Carmichael function: exponent of multiplicative group of ring of modulo n, order of any element divides it
+    :param n: ring modulo
+    :return: lambda(n)
+    """
+    result = 1
+    for p, k in factorize(n).items():
+        if p == 2 and k >= 3:
+            result = lcm(result, 2 ** (k - 2))
+        else:
+            result = lcm(result, p ** (k - 1) * (p - 1))
     return result
 
 
+def multiplicative_order(a: int, n: int) -> int:
+    """
+    Find multiplicative order of a modulo n: prime factors are removed from lambda(n) while a^order = 1.
+    ArithmeticError is raised if a is not invertible.
+    :param a: invertible element
+    :param n: ring modulo
+    :return: least k > 0 with a^k = 1 (mod n)
+    """
+    if gcd(a, n) != 1:
+        raise ArithmeticError(f"GCD({a}, {n}) != 1. Element has no multiplicative order!")
+    order = carmichael(n)
+    for p, k in factorize(order).items():
+        for _ in range(k):
+            if pow(a, order // p, n) != 1:
+                break
+            order //= p
+    return order
+
+
+def primitive_root(n: int) -> int:
+    """
+    Find the least primitive root modulo n (generator of multiplicative group).
+    It exists only for n = 1, 2, 4, p^k, 2p^k, otherwise ArithmeticError is raised.
+    :param n: ring modulo
+    :return: element of order phi(n)
+    """
+    order = euler_phi(n)
+    if carmichael(n) != order:
+        raise ArithmeticError(f"Multiplicative group modulo {n} is not cyclic. Primitive root not exists!")
+    primes = factorize(order)
+    for g in range(1, n + 1):
+        if gcd(g, n) == 1 and all(pow(g, order // p, n) != 1 for p in primes):
+            return g % n
+
+
+def baby_step_giant_step(g: int, h: int, order: int, n: int, table_size: int,
+                         deadline: Optional[float] = None) -> Optional[int]:
+    """
+    Solve g^x = h (mod n) for 0 <= x < order: h * g^(-im) is looked up in table of baby steps g^j, j < m.
+    Table has min(sqrt(order), table_size) elements, so greater orders take more giant steps.
+    :param g: invertible element
+    :param h: element to find logarithm of
+    :param order: order of g (or its multiple)
+    :param n: ring modulo
+    :param table_size: max count of baby steps in memory
+    :param deadline: time.monotonic() value, after which CalculationLimitError is raised (None for no limit)
+    :return: logarithm or None if h is not a power of g
+    """
+    m = max(min(isqrt(order - 1) + 1, table_size), 1)
+    table = {}
+    e = 1
+    for j in range(m):
+        table.setdefault(e, j)
+        e = e * g % n
+    factor = find_inverse(e, n)  # g^(-m)
+    for i in range(0, order, m):
+        if i % (1024 * m) == 0 and deadline is not None and time.monotonic() > deadline:
+            raise CalculationLimitError("Discrete logarithm takes too long")
+        j = table.get(h)
+        if j is not None:
+            return i + j
+        h = h * factor % n
+    return None
+
+
+def discrete_log(a: int, b: int, n: int, table_size: int = 1 << 20, time_limit: Optional[float] = None) -> int:
+    """
+    Solve a^x = b (mod n) by Pohlig-Hellman algorithm: x is found modulo every prime power q^e
+    of order of a by e logarithms in subgroup of order q (baby-step giant-step), then glued by CRT.
+    Common factors of a and n are cancelled first: a^x = b (mod n) turns into
+    (a / g) a^(x - 1) = b / g (mod n / g) with g = gcd(a, n), until a becomes invertible.
+    ArithmeticError is raised if solution not exists.
+    :param a: base
+    :param b: element to find logarithm of
+    :param n: ring modulo
+    :param table_size: max count of baby steps in memory
+    :param time_limit: seconds for baby-step giant-step, CalculationLimitError is raised if they are over
+    :return: the least x >= 0
+    """
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+    a, b = a % n, b % n
+    shift, factor = 0, 1  # a^x = factor * a^(x - shift) (mod n) for reduced n and x >= shift
+    while True:
+        g = gcd(a, n)
+        if g == 1:
+            break
+        if b == factor:  # x = shift is the least solution
+            return shift
+        if b % g:
+            raise ArithmeticError(f"{b} is not a power of {a} modulo {n}. Discrete logarithm not exists!")
+        b, n = b // g, n // g
+        factor = factor * (a // g) % n
+        shift += 1
+    if n == 1:
+        return shift
+    a, b = a % n, b * find_inverse(factor, n) % n
+    order = multiplicative_order(a, n)
+    if gcd(b, n) != 1:  # powers of a are invertible
+        raise ArithmeticError(f"{b} is not a power of {a} modulo {n}. Discrete logarithm not exists!")
+    comparisons = {}
+    for q, e in factorize(order).items():
+        g = pow(a, order // q ** e, n)  # generator of subgroup of order q^e
+        h = pow(b, order // q ** e, n)
+        gamma = pow(g, q ** (e - 1), n)  # element of order q
+        x = 0
+        for k in range(e):
+            hk = pow(h * find_inverse(pow(g, x, n), n) % n, q ** (e - 1 - k), n)
+            d = baby_step_giant_step(gamma, hk, q, n, table_size, deadline)
+            if d is None:
+                raise ArithmeticError(f"{b} is not a power of {a} modulo {n}. Discrete logarithm not exists!")
+            x += d * q ** k
+        comparisons[q ** e] = x
+    x, _ = solve_comparisons(comparisons)
+    if pow(a, x, n) != b % n:
+        raise ArithmeticError(f"{b} is not a power of {a} modulo {n}. Discrete logarithm not exists!")
+    return x + shift
+
+
 if __name__ == "__main__":
     print("Copyright (C) 2021-2023 Ilya Bezrukov, Stepan Chizhov, Artem Grishin")
     print("Licensed under GNU GPL-2.0-or-later")
@@ -19,10 +19,13 @@
 
 import math
 import operator as op
+from functools import lru_cache
+from typing import Optional
 
 from shunting_yard import ShuntingYard, Operator, Function, Evaluator
 from shunting_yard import InvalidSyntax, InvalidName, InvalidArguments, CalculationLimitError
 from config import Config
+from rings import find_inverse
 
 
 def cotan(x):
@@ -88,12 +91,86 @@ mathSY = ShuntingYard(
 )
 
 
-def safe_eval(expr):
+class Residue (int):
+    """
+    Element of Z/n in modular mode. Integer literals and results of integer operations (powers within
+    /calc limits) stay integers while they are not greater than CALC_OPERAND_LIMIT, so they can be
+    used as exponents, while larger values and results of large powers and division are residues.
+    Operation with residue gives residue.
+    """
+    pass
+
+
+@lru_cache(maxsize=32)
+def modularSY(n: int) -> ShuntingYard:
+    """
+    Expression engine for ring Z/n: every operation with residue is reduced modulo n,
+    power is three-argument pow (O(log e) multiplications), division multiplies by modular inverse
+    :param n: ring modulo
+    :return: shunting yard with modular operators
+    """
+    exact_limit = Config.CALC_OPERAND_LIMIT
+
+    def ring(func):
+        def inner(*args):
+            result = func(*args)
+            if abs(result) > exact_limit or any(isinstance(x, Residue) for x in args):
+                return Residue(result % n)
+            return result
+        return inner
+
+    def convert(token):
+        value = int(token)
+        return value if value <= exact_limit else Residue(value % n)
+
+    integer_power = Evaluator.limit(Config.CALC_POW_UNION_LIMIT, Config.CALC_POW_EACH_LIMIT)
+
+    def power(x, p):
+        if isinstance(p, Residue):
+            raise InvalidArguments("Exponent must be integer, not element of the ring")
+        if not isinstance(x, Residue) and p >= 0 and integer_power([x, p]):
+            return x ** p
+        if p < 0:
+            x, p = find_inverse(x, n), -p
+        return Residue(pow(x, p, n))
+
+    def divide(x, y):
+        return Residue(x * find_inverse(y, n) % n)
+
+    return ShuntingYard(
+        [
+            Operator("+", ring(op.add), 1),
+            Operator("-", ring(op.sub), 1),
+            Operator("*", ring(op.mul), 2),
+            Operator("/", divide, 2),
+            Operator("-", ring(op.neg), 5, ary=Operator.Ary.UNARY),
+            Operator("+", ring(op.pos), 5, ary=Operator.Ary.UNARY),
+            Operator("^", power, 10, assoc=Operator.Associativity.RIGHT),
+        ],
+        [
+            Function("pow", power, argc=2),
+            Function("inverse", lambda x: Residue(find_inverse(x, n))),
+        ],
+        use_variables=False,
+        converter=convert,
+        default_limiter=Evaluator.limit(None, Config.CALC_OPERAND_LIMIT)
+    )
+
+
+def safe_eval(expr, modulo: Optional[int] = None):
+    """
+    Evaluate expression
+    :param expr: expression
+    :param modulo: evaluate in ring Z/n (None for integers and floats)
+    :return: value of expression
+    """
     if len(expr) >= Config.CALC_LINE_LIMIT:
         raise CalculationLimitError("Expression length limit exceeded")
-    pexpr = mathSY.parse(expr)
-    pexpr = mathSY.shunt(pexpr)
-    return pexpr.eval()
+    sy = mathSY if modulo is None else modularSY(modulo)
+    pexpr = sy.parse(expr)
+    pexpr = sy.shunt(pexpr)
+    result = pexpr.eval()
+    return result if modulo is None else int(result) % modulo
 
 
 if __name__ == "__main__":
@@ -17,7 +17,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from io import StringIO
+import re
+import textwrap
+from io import StringIO, BytesIO
+from typing import Iterable, Optional
 
 import telebot
 from telebot.types import ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove,\
@@ -28,7 +31,9 @@ from git import Repo
 
 from config import *
 from logic import build_table
-from matrix import Matrix, SizesMatchError, SquareMatrixRequired, NonInvertibleMatrix
+from matrix import ModularMatrix, SizesMatchError, SquareMatrixRequired, NonInvertibleMatrix, MatrixTooLarge,\
+    IntegerMatrixRequired, parse_matrix
+from polynomial import Polynomial, PolynomialTooLarge
 from rings import *
 from safe_eval import safe_eval, CalculationLimitError
 from shunting_yard import InvalidSyntax, InvalidName, InvalidArguments
@@ -43,12 +48,25 @@ menu.add(KeyboardButton("/help"))
 menu.add(KeyboardButton("/det"))
 menu.add(KeyboardButton("/ref"))
 menu.add(KeyboardButton("/m_inverse"))
+menu.add(KeyboardButton("/solve"))
+menu.add(KeyboardButton("/m_mul"))
+menu.add(KeyboardButton("/m_pow"))
+menu.add(KeyboardButton("/eigen"))
+menu.add(KeyboardButton("/charpoly"))
+menu.add(KeyboardButton("/hnf"))
+menu.add(KeyboardButton("/snf"))
 
 menu.add(KeyboardButton("/factorize"))
 menu.add(KeyboardButton("/euclid"))
+menu.add(KeyboardButton("/crt"))
+menu.add(KeyboardButton("/order"))
+menu.add(KeyboardButton("/primroot"))
+menu.add(KeyboardButton("/dlog"))
+menu.add(KeyboardButton("/sqrt_mod"))
 menu.add(KeyboardButton("/idempotents"))
 menu.add(KeyboardButton("/nilpotents"))
 menu.add(KeyboardButton("/inverse"))
+menu.add(KeyboardButton("/poly"))
 menu.add(KeyboardButton("/logic"))
 
 menu.add(KeyboardButton("/calc"))
@@ -95,6 +113,35 @@ def get_admin_menu(call):
         return mk
 
 
+MESSAGE_LENGTH = 4096  # telegram limit
+
+
+def send_lines(chat_id, lines: Iterable[str], parse_mode: Optional[str] = None) -> str:
+    # long answer is sent in several messages, every one up to MESSAGE_LENGTH (markup must not span lines)
+    text = []
+    chunk = ""
+    for line in lines:
+        text.append(line)
+        if chunk and len(chunk) + len(line) >= MESSAGE_LENGTH:
+            bot.send_message(chat_id, chunk, parse_mode=parse_mode)
+            chunk = ""
+        chunk += line + "\n"
+    bot.send_message(chat_id, chunk, parse_mode=parse_mode, reply_markup=menu)
+    return "\n".join(text)
+
+
+def send_code(chat_id, title: str, text: str, footer: str = "") -> str:
+    # monospace answer (matrix), too long one is sent as text file
+    answer = f"{title}\n<code>{text}</code>" + (f"\n{footer}" if footer else "")
+    if len(answer) <= MESSAGE_LENGTH:
+        bot.send_message(chat_id, answer, parse_mode="html", reply_markup=menu)
+    else:
+        caption = title + (f"\n{footer}" if footer else "")
+        bot.send_document(chat_id, BytesIO(text.encode()), visible_file_name="result.txt",
+                          caption=caption, reply_markup=menu)
+    return answer
+
+
 @bot.message_handler(commands=["start"])
 def start_message(message):
     send_mess = (
@@ -120,15 +167,29 @@ def send_help(message):
                       "/det - определитель матрицы.\n"
                       "/ref - ступенчатый вид матрицы (верхне-треугольный).\n"
                       "/m_inverse - обратная матрица.\n"
+                      "/solve - решение системы линейных уравнений.\n"
+                      "/m_mul - произведение двух матриц.\n"
+                      "/m_pow - степень квадратной матрицы (в том числе отрицательная).\n"
+                      "/eigen - собственные значения квадратной матрицы.\n"
+                      "/charpoly - характеристический многочлен квадратной матрицы.\n"
+                      "/hnf - нормальная форма Эрмита целочисленной матрицы.\n"
+                      "/snf - нормальная форма Смита целочисленной матрицы.\n"
+                      "Для вычислений в Z/n добавьте перед матрицей строку <code>mod n</code>.\n"
                       "\n<b>Теория чисел и дискретная математика</b>\n"
-                      "/factorize - разложение натурального числа в простые.\n"
+                      "/factorize - разложение натурального числа в простые (a..b - всех чисел отрезка).\n"
                       "/euclid - НОД двух чисел и решение Диофантового уравнения.\n"
+                      "/crt - решение системы сравнений (китайская теорема об остатках).\n"
+                      "/order - мультипликативный порядок элемента в Z/n.\n"
+                      "/primroot - первообразный корень по модулю n.\n"
+                      "/dlog - дискретный логарифм в Z/n.\n"
+                      "/sqrt_mod - квадратные корни в Z/n.\n"
                       "/idempotents - идемпотентные элементы в Z/n.\n"
                       "/nilpotents - нильпотентные элементы в Z/n.\n"
-                      "/inverse - обратный элемент в Z/n.\n"
+                      "/inverse - обратные элементы в Z/n (одного, списка или отрезка a..b).\n"
+                      "/poly - операции с многочленами над Z/n (+, -, *, /, gcd, inv, eval).\n"
                       "/logic - таблица истинности выражения.\n"
                       "\n<b>Калькуляторы</b>\n"
-                      "/calc - калькулятор математических выражений.\n"
+                      "/calc - калькулятор математических выражений (/calc mod n - вычисления в Z/n).\n"
                       "\n<b>Об этом боте</b> /about\n"
                       ),
                      parse_mode="html", reply_markup=inline_menu)
@@ -161,9 +222,7 @@ def ref_input(message):
 @log_function_call("ref")
 def calc_ref(message, action, matrix):
     result = matrix.ref()
-    answer = f"Матрица в ступенчатом виде:\n<code>{str(result)}</code>"
-    bot.send_message(message.chat.id, answer, parse_mode="html", reply_markup=menu)
-    return answer
+    return send_code(message.chat.id, "Матрица в ступенчатом виде:", str(result), f"Ранг: {matrix.rank()}")
 
 
 @bot.message_handler(commands=["m_inverse"])
@@ -180,22 +239,247 @@ def calc_inv(message, action, matrix):
         bot.send_message(message.chat.id, "Обратной матрицы не существует!", reply_markup=menu)
         return
     else:
-        answer = f"Обратная матрица:\n<code>{str(result)}</code>"
+        return send_code(message.chat.id, "Обратная матрица:", str(result))
+
+
+@bot.message_handler(commands=["solve"])
+def solve_input(message):
+    m = bot.send_message(message.chat.id, "Введите расширенную матрицу системы A|b: (одним сообщением)",
+                         reply_markup=hide_menu)
+    bot.register_next_step_handler(m, matrix_input, action="solve")
+
+
+@log_function_call("solve")
+def calc_solve(message, action, matrix):
+    a = matrix.submatrix(range(matrix.m), range(matrix.n - 1))
+    b = matrix.submatrix(range(matrix.m), [matrix.n - 1])
+    try:
+        result = a.solve(b)
+    except (NonInvertibleMatrix, SizesMatchError):
+        bot.send_message(message.chat.id, "Система не имеет единственного решения!", reply_markup=menu)
+        return
+    else:
+        solution = "\n".join([f"x{i + 1} = {value.strip()}" for i, value in enumerate(str(result).split("\n"))])
+        return send_code(message.chat.id, "Решение системы:", solution)
+
+
+@bot.message_handler(commands=["m_mul"])
+def mul_input(message):
+    m = bot.send_message(message.chat.id, "Введите две матрицы, разделенные пустой строкой: (одним сообщением)",
+                         reply_markup=hide_menu)
+    bot.register_next_step_handler(m, matrix_input, action="m_mul")
+
+
+@log_function_call("m_mul")
+def calc_mul(message, action, matrix, other):
+    try:
+        result = matrix * other
+    except SizesMatchError:
+        bot.send_message(message.chat.id, "Умножение возможно только для матриц размеров MxN и NxL!",
+                         reply_markup=menu)
+        return
+    else:
+        return send_code(message.chat.id, "Произведение матриц:", str(result))
+
+
+@bot.message_handler(commands=["m_pow"])
+def pow_input(message):
+    m = bot.send_message(message.chat.id, "Введите показатель степени:", reply_markup=hide_menu)
+    bot.register_next_step_handler(m, pow_input_matrix)
+
+
+def pow_input_matrix(message):
+    try:
+        power = int(message.text.strip())
+    except ValueError:
+        bot.send_message(message.chat.id, "Ошибка ввода данных", reply_markup=menu)
+        return
+    m = bot.send_message(message.chat.id, "Введите матрицу: (одним сообщением)")
+    bot.register_next_step_handler(m, matrix_input, action="m_pow", power=power)
+
+
+@log_function_call("m_pow")
+def calc_pow(message, action, matrix, power):
+    try:
+        result = matrix ** power
+    except SquareMatrixRequired:
+        bot.send_message(message.chat.id, "Возводить в степень можно только квадратную матрицу!", reply_markup=menu)
+        return
+    except NonInvertibleMatrix:
+        bot.send_message(message.chat.id, "Для отрицательной степени матрица должна быть обратимой!",
+                         reply_markup=menu)
+        return
+    except CalculationLimitError:
+        bot.send_message(message.chat.id, "Слишком большая матрица или показатель степени!", reply_markup=menu)
+        return
+    else:
+        return send_code(message.chat.id, f"Матрица в степени {power}:", str(result))
+
+
+@bot.message_handler(commands=["eigen"])
+def eigen_input(message):
+    m = bot.send_message(message.chat.id, "Введите квадратную матрицу: (одним сообщением)", reply_markup=hide_menu)
+    bot.register_next_step_handler(m, matrix_input, action="eigen")
+
+
+def format_complex(z: complex) -> str:
+    if z.imag == 0:
+        return f"{z.real:.6g}"
+    sign = "-" if z.imag < 0 else "+"
+    return f"{z.real:.6g} {sign} {abs(z.imag):.6g}i"
+
+
+@log_function_call("eigen")
+def calc_eigen(message, action, matrix):
+    if isinstance(matrix, ModularMatrix):
+        bot.send_message(message.chat.id, "Собственные значения вычисляются только для числовых матриц!",
+                         reply_markup=menu)
+        return
+    try:
+        result = matrix.eigenvalues()
+    except SquareMatrixRequired:
+        bot.send_message(message.chat.id, "Собственные значения определены только для квадратной матрицы!",
+                         reply_markup=menu)
+        return
+    except (CalculationLimitError, ArithmeticError):
+        bot.send_message(message.chat.id, "Не удалось вычислить собственные значения за отведенное время!",
+                         reply_markup=menu)
+        return
+    else:
+        values = "\n".join(f"λ{i + 1} = {format_complex(z)}"
+                           for i, z in enumerate(sorted(result, key=lambda z: (-z.real, z.imag))))
+        answer = f"Собственные значения:\n<code>{values}</code>"
         bot.send_message(message.chat.id, answer, parse_mode="html", reply_markup=menu)
         return answer
 
 
+@bot.message_handler(commands=["charpoly"])
+def charpoly_input(message):
+    m = bot.send_message(message.chat.id, "Введите квадратную матрицу: (одним сообщением)", reply_markup=hide_menu)
+    bot.register_next_step_handler(m, matrix_input, action="charpoly")
+
+
+def format_polynomial(coefficients: list, variable: str = "x") -> str:
+    # coefficients from the highest power to constant term
+    degree = len(coefficients) - 1
+    terms = []
+    for i, c in enumerate(coefficients):
+        if not c:
+            continue
+        power = degree - i
+        value = f"{c:.6g}" if isinstance(c, float) else str(c)
+        sign = "-" if value.startswith("-") else "+"
+        value = value.lstrip("-")
+        if "/" in value and power:
+            value = f"({value})"
+        if power:
+            value = ("" if value == "1" else value) + variable + (f"^{power}" if power > 1 else "")
+        terms.append((sign, value))
+    if not terms:
+        return "0"
+    result = ("-" if terms[0][0] == "-" else "") + terms[0][1]
+    return result + "".join(f" {sign} {value}" for sign, value in terms[1:])
+
+
+@log_function_call("charpoly")
+def calc_charpoly(message, action, matrix):
+    try:
+        result = matrix.charpoly()
+    except SquareMatrixRequired:
+        bot.send_message(message.chat.id, "Характеристический многочлен определен только для квадратной матрицы!",
+                         reply_markup=menu)
+        return
+    except CalculationLimitError:
+        bot.send_message(message.chat.id, "Не удалось вычислить характеристический многочлен за отведенное время!",
+                         reply_markup=menu)
+        return
+    else:
+        answer = f"Характеристический многочлен:\n<code>{format_polynomial(result)}</code>"
+        bot.send_message(message.chat.id, answer, parse_mode="html", reply_markup=menu)
+        return answer
+
+
+@bot.message_handler(commands=["hnf"])
+def hnf_input(message):
+    m = bot.send_message(message.chat.id, "Введите целочисленную матрицу: (одним сообщением)", reply_markup=hide_menu)
+    bot.register_next_step_handler(m, matrix_input, action="hnf")
+
+
+@log_function_call("hnf")
+def calc_hnf(message, action, matrix):
+    try:
+        result = matrix.hermite_form()
+    except IntegerMatrixRequired:
+        bot.send_message(message.chat.id, "Нормальная форма Эрмита определена только для целочисленной матрицы!",
+                         reply_markup=menu)
+        return
+    else:
+        return send_code(message.chat.id, "Нормальная форма Эрмита:", str(result))
+
+
+@bot.message_handler(commands=["snf"])
+def snf_input(message):
+    m = bot.send_message(message.chat.id, "Введите целочисленную матрицу: (одним сообщением)", reply_markup=hide_menu)
+    bot.register_next_step_handler(m, matrix_input, action="snf")
+
+
+@log_function_call("snf")
+def calc_snf(message, action, matrix):
+    try:
+        result = matrix.smith_form()
+    except IntegerMatrixRequired:
+        bot.send_message(message.chat.id, "Нормальная форма Смита определена только для целочисленной матрицы!",
+                         reply_markup=menu)
+        return
+    else:
+        factors = "\n".join(f"d{i + 1} = {d}" for i, d in enumerate(result))
+        return send_code(message.chat.id, "Инвариантные множители (диагональ нормальной формы Смита):", factors)
+
+
 action_mapper = {
     "det": calc_det,
     "ref": calc_ref,
-    "m_inverse": calc_inv
+    "m_inverse": calc_inv,
+    "solve": calc_solve,
+    "m_mul": calc_mul,
+    "m_pow": calc_pow,
+    "eigen": calc_eigen,
+    "charpoly": calc_charpoly,
+    "hnf": calc_hnf,
+    "snf": calc_snf,
 }
 
-
-def matrix_input(message, action):
+matrices_count = {"m_mul": 2}  # actions, which take several matrices separated by empty line
+
+
+def matrix_input(message, action, **params):
+    count = matrices_count.get(action, 1)
+    text = message.text.strip()
+    modulo = None
+    ring = re.match(r"mod\s+(\d+)\s*\n", text)  # optional first line "mod n": matrices over Z/n
+    if ring:
+        modulo = int(ring.group(1))
+        text = text[ring.end():]
+        if modulo >= Config.MAX_MODULO or modulo < 2:
+            bot.reply_to(message, f"Ограничение: 2 <= n < {Config.MAX_MODULO:E}", reply_markup=menu)
+            return
+    blocks = re.split(r"\n\s*\n", text) if count > 1 else [text]
+    if len(blocks) != count:
+        bot.reply_to(message, f"Необходимо ввести {count} матрицы, разделенные пустой строкой", reply_markup=menu)
+        return
     try:
-        lst = [[float(x) for x in row.split()] for row in message.text.split("\n")]
-        matrix = Matrix.from_list(lst)
+        matrices = [parse_matrix(block, Config.MAX_MATRIX) for block in blocks]
+        if modulo is not None:
+            if not all(matrix.exact for matrix in matrices):
+                bot.reply_to(message, f"Элементы матрицы над Z/{modulo} должны быть целыми числами или дробями p/q",
+                             reply_markup=menu)
+                return
+            matrices = [ModularMatrix.from_matrix(matrix, modulo) for matrix in matrices]
+    except ArithmeticError:
+        bot.reply_to(message, f"Знаменатели элементов должны быть обратимы в Z/{modulo}", reply_markup=menu)
+    except MatrixTooLarge:
+        bot.reply_to(message, f"Ввод матрицы имеет ограничение в {Config.MAX_MATRIX}x{Config.MAX_MATRIX}!",
+                     reply_markup=menu)
     except SizesMatchError:
         bot.reply_to(message,
                      "Несовпадение размеров строк или столбцов. Матрица должна быть <b>прямоугольной</b>.",
@@ -207,12 +491,8 @@ def matrix_input(message, action):
                      reply_markup=menu,
                      parse_mode="html")
     else:
-        if matrix.n > Config.MAX_MATRIX:
-            bot.reply_to(message, f"Ввод матрицы имеет ограничение в {Config.MAX_MATRIX}x{Config.MAX_MATRIX}!",
-                         reply_markup=menu)
-        else:
-            next_handler = action_mapper[action]
-            next_handler(message, action=action, matrix=matrix)
+        next_handler = action_mapper[action]
+        next_handler(message, action, *matrices, **params)
 
 
 @bot.message_handler(commands=["logic"])
@@ -263,27 +543,19 @@ def ring_output(message, command):
         bot.send_message(message.chat.id, f"Ограничение: 2 <= n < {Config.MAX_MODULO:E}", reply_markup=menu)
         return
     if command == "idempotents":
-        result = [f"{row} -> {el}" for row, el in find_idempotents(n)]
+        result = find_idempotents(n)
+        page = [f"{row} -> {el}" for row, el in result[:Config.MAX_ELEMENTS]]
         title = "Идемпотенты"
     elif command == "nilpotents":
         result = find_nilpotents(n)
+        page = [str(x) for x in result[:Config.MAX_ELEMENTS]]
         title = "Нильпотенты"
     else:
         return
+    lines = [f"<b> {title} в Z/{n}</b>", f"Количество: {len(result)}", "", *page]
     if len(result) > Config.MAX_ELEMENTS:
-        s = "Элементов слишком много чтобы их вывести..."
-    else:
-        s = "\n".join([str(x) for x in result])
-    answer = (f"<b> {title} в Z/{n}</b>\n"
-              f"Количество: {len(result)}\n\n"
-              f"{s}\n")
-    bot.send_message(
-        message.chat.id,
-        answer,
-        reply_markup=menu,
-        parse_mode="html"
-    )
-    return answer
+        lines += ["...", f"Показаны первые {Config.MAX_ELEMENTS} элементов"]
+    return send_lines(message.chat.id, lines, parse_mode="html")
 
 
 @bot.message_handler(commands=["inverse"])
@@ -301,18 +573,34 @@ def inverse_input_element(message):
     if n >= Config.MAX_MODULO or n < 2:
         bot.send_message(message.chat.id, f"Ограничение: 2 <= n < {Config.MAX_MODULO:E}", reply_markup=menu)
         return
-    m = bot.send_message(message.chat.id, "Введите элемент, для которого требуется найти обратный:")
+    m = bot.send_message(message.chat.id, "Введите элемент, для которого требуется найти обратный "
+                                          "(или несколько через пробел, или отрезок a..b):")
     bot.register_next_step_handler(m, inverse_output, modulo=n)
 
 
 @log_function_call("inverse")
 def inverse_output(message, modulo):
+    text = message.text.strip()
+    interval = re.fullmatch(r"(-?\d+)\s*\.\.\s*(-?\d+)", text)
     try:
-        n = int(message.text.strip())
+        if interval:
+            a, b = int(interval.group(1)), int(interval.group(2))
+            # length is checked before range is built: len() fails for huge ranges
+            elements = range(a, b + 1) if 0 < b - a + 1 <= Config.INVERSE_BATCH_MAX else []
+        else:
+            elements = [int(x) for x in re.split(r"[\s,;]+", text)]
     except ValueError:
         bot.send_message(message.chat.id, "Ошибка ввода данных", reply_markup=menu)
         return
-    n = n % modulo
+    if not 0 < len(elements) <= Config.INVERSE_BATCH_MAX:
+        bot.send_message(message.chat.id, f"Ограничение: от 1 до {Config.INVERSE_BATCH_MAX} элементов",
+                         reply_markup=menu)
+        return
+    if len(elements) > 1:
+        lines = [f"{a % modulo}^-1 = {inverse}" if inverse is not None else f"{a % modulo}^-1 не существует"
+                 for a, inverse in zip(elements, find_inverses(elements, modulo))]
+        return send_lines(message.chat.id, lines)
+    n = elements[0] % modulo
     try:
         result = find_inverse(n, modulo)
     except ArithmeticError:
@@ -328,12 +616,15 @@ def inverse_output(message, modulo):
 
 @bot.message_handler(commands=["factorize"])
 def factorize_input(message):
-    m = bot.send_message(message.chat.id, "Введите число:")
+    m = bot.send_message(message.chat.id, "Введите число или отрезок a..b:")
     bot.register_next_step_handler(m, factorize_output)
 
 
 @log_function_call("factorize")
 def factorize_output(message):
+    interval = re.fullmatch(r"(\d+)\s*\.\.\s*(\d+)", message.text.strip())
+    if interval:
+        return factorize_range_output(message, int(interval.group(1)), int(interval.group(2)))
     try:
         n = int(message.text.strip())
     except ValueError:
@@ -345,12 +636,35 @@ def factorize_output(message):
             f"Разложение доступно для положительных целых чисел n: 2 <= n <= {Config.FACTORIZE_MAX:E}"
         )
     else:
-        fn = factorize(n)
+        try:
+            fn = factorize(n, Config.FACTORIZE_TIME_LIMIT)
+        except CalculationLimitError:
+            bot.send_message(message.chat.id, "Не удалось разложить число за отведенное время!", reply_markup=menu)
+            return
         answer = f"{n} = " + factorize_str(fn)
         bot.send_message(message.chat.id, answer)
         return answer
 
 
+def factorize_range_output(message, a, b):
+    if not 2 <= a <= b <= Config.FACTORIZE_MAX or b - a >= Config.FACTORIZE_RANGE:
+        bot.send_message(
+            message.chat.id,
+            f"Разложение доступно для отрезков a..b: 2 <= a <= b <= {Config.FACTORIZE_MAX:E}, "
+            f"не более {Config.FACTORIZE_RANGE} чисел"
+        )
+        return
+
+    def lines():
+        try:
+            for n, fn in factorize_range(a, b, Config.FACTORIZE_TIME_LIMIT):
+                yield f"{n} = " + factorize_str(fn)
+        except CalculationLimitError:
+            yield "Не удалось разложить остальные числа за отведенное время!"
+
+    return send_lines(message.chat.id, lines())
+
+
 @bot.message_handler(commands=["euclid"])
 def euclid_input(message):
     m = bot.send_message(message.chat.id, "Введите два числа через пробел:")
@@ -375,16 +689,240 @@ def euclid_output(message):
     return answer
 
 
+@bot.message_handler(commands=["crt"])
+def crt_input(message):
+    m = bot.send_message(message.chat.id, "Введите сравнения x ≡ a (mod m), каждое в отдельной строке в виде: a m")
+    bot.register_next_step_handler(m, crt_output)
+
+
+@log_function_call("crt")
+def crt_output(message):
+    try:
+        comparisons = [tuple(map(int, re.fullmatch(r"(-?\d+)\s+(?:mod\s+)?(\d+)", line.strip()).groups()))
+                       for line in message.text.strip().split("\n") if line.strip()]
+    except (AttributeError, ValueError):
+        bot.send_message(message.chat.id, "Ошибка ввода данных", reply_markup=menu)
+        return
+    if not 0 < len(comparisons) <= Config.MAX_ELEMENTS or not all(2 <= m < Config.MAX_MODULO for a, m in comparisons):
+        bot.send_message(message.chat.id, f"Ограничение: до {Config.MAX_ELEMENTS} сравнений, "
+                                          f"модули 2 <= m < {Config.MAX_MODULO:E}", reply_markup=menu)
+        return
+    try:
+        x, modulo = solve_comparisons((m, a) for a, m in comparisons)
+    except ArithmeticError:
+        answer = "Система сравнений <b>не имеет</b> решений"
+    else:
+        answer = f"x ≡ {x} (mod {modulo})"
+    bot.send_message(message.chat.id, answer, parse_mode="html", reply_markup=menu)
+    return answer
+
+
+@bot.message_handler(commands=["order"])
+def order_input(message):
+    m = bot.send_message(message.chat.id, "Введите элемент a и модуль кольца n через пробел:")
+    bot.register_next_step_handler(m, order_output)
+
+
+@log_function_call("order")
+def order_output(message):
+    try:
+        a, n = map(int, message.text.split())
+    except ValueError:
+        bot.send_message(message.chat.id, "Ошибка ввода данных", reply_markup=menu)
+        return
+    if n >= Config.MAX_MODULO or n < 2:
+        bot.send_message(message.chat.id, f"Ограничение: 2 <= n < {Config.MAX_MODULO:E}", reply_markup=menu)
+        return
+    try:
+        result = multiplicative_order(a, n)
+    except ArithmeticError:
+        answer = f"{a % n} <b>необратим</b> в кольце Z/{n}, поэтому не имеет мультипликативного порядка"
+    else:
+        answer = f"ord({a % n}) = {result} в Z/{n}"
+    bot.send_message(message.chat.id, answer, parse_mode="html", reply_markup=menu)
+    return answer
+
+
+@bot.message_handler(commands=["primroot"])
+def primroot_input(message):
+    m = bot.send_message(message.chat.id, "Введите модуль кольца:")
+    bot.register_next_step_handler(m, primroot_output)
+
+
+@log_function_call("primroot")
+def primroot_output(message):
+    try:
+        n = int(message.text.strip())
+    except ValueError:
+        bot.send_message(message.chat.id, "Ошибка ввода данных", reply_markup=menu)
+        return
+    if n >= Config.MAX_MODULO or n < 2:
+        bot.send_message(message.chat.id, f"Ограничение: 2 <= n < {Config.MAX_MODULO:E}", reply_markup=menu)
+        return
+    try:
+        result = primitive_root(n)
+    except ArithmeticError:
+        answer = f"Первообразных корней по модулю {n} <b>не существует</b> (n должно быть 2, 4, p^k или 2p^k)"
+    else:
+        answer = f"Наименьший первообразный корень по модулю {n}: {result}\nПорядок: φ({n}) = {euler_phi(n)}"
+    bot.send_message(message.chat.id, answer, parse_mode="html", reply_markup=menu)
+    return answer
+
+
+@bot.message_handler(commands=["dlog"])
+def dlog_input(message):
+    m = bot.send_message(message.chat.id, "Для решения a^x ≡ b (mod n) введите a, b и n через пробел:")
+    bot.register_next_step_handler(m, dlog_output)
+
+
+@log_function_call("dlog")
+def dlog_output(message):
+    try:
+        a, b, n = map(int, message.text.split())
+    except ValueError:
+        bot.send_message(message.chat.id, "Ошибка ввода данных", reply_markup=menu)
+        return
+    if n >= Config.MAX_MODULO or n < 2:
+        bot.send_message(message.chat.id, f"Ограничение: 2 <= n < {Config.MAX_MODULO:E}", reply_markup=menu)
+        return
+    try:
+        x = discrete_log(a, b, n, Config.DLOG_TABLE_SIZE, Config.DLOG_TIME_LIMIT)
+    except CalculationLimitError:
+        bot.send_message(message.chat.id, "Не удалось найти логарифм за отведенное время!", reply_markup=menu)
+        return
+    except ArithmeticError:
+        answer = f"Сравнение {a}^x ≡ {b} (mod {n}) <b>не имеет</b> решений"
+    else:
+        if gcd(a, n) == 1:
+            answer = f"x = {x} + {multiplicative_order(a, n)}k, k ∈ Z"
+        else:  # powers of non-invertible a are not periodic from the beginning
+            answer = f"Наименьшее решение: x = {x}"
+    bot.send_message(message.chat.id, answer, parse_mode="html", reply_markup=menu)
+    return answer
+
+
+@bot.message_handler(commands=["sqrt_mod"])
+def sqrt_mod_input(message):
+    m = bot.send_message(message.chat.id, "Для решения x^2 ≡ a (mod n) введите a и n через пробел:")
+    bot.register_next_step_handler(m, sqrt_mod_output)
+
+
+@log_function_call("sqrt_mod")
+def sqrt_mod_output(message):
+    try:
+        a, n = map(int, message.text.split())
+    except ValueError:
+        bot.send_message(message.chat.id, "Ошибка ввода данных", reply_markup=menu)
+        return
+    if n >= Config.MAX_MODULO or n < 2:
+        bot.send_message(message.chat.id, f"Ограничение: 2 <= n < {Config.MAX_MODULO:E}", reply_markup=menu)
+        return
+    result = sqrt_mod(a, n)
+    if not result:
+        answer = f"{a % n} <b>не является</b> квадратом в Z/{n}"
+    else:
+        page = result[:Config.MAX_ELEMENTS]
+        s = "\n".join(str(x) for x in (sorted(page) if len(page) == len(result) else page))
+        if len(result) > Config.MAX_ELEMENTS:
+            s += f"\n...\nПоказаны первые {Config.MAX_ELEMENTS} корней"
+        answer = (f"<b>Корни x^2 ≡ {a % n} (mod {n})</b>\n"
+                  f"Количество: {len(result)}\n\n"
+                  f"{s}\n")
+    bot.send_message(message.chat.id, answer, parse_mode="html", reply_markup=menu)
+    return answer
+
+
+POLY_OPERATIONS = ("+", "-", "*", "/", "gcd", "inv", "eval")
+
+
+@bot.message_handler(commands=["poly"])
+def poly_input(message):
+    m = bot.send_message(message.chat.id,
+                         "Введите одним сообщением:\n"
+                         "<code>mod n</code>\n"
+                         "первый многочлен (<code>x^3 + 2x - 1</code> или коэффициенты <code>1 0 2 -1</code>)\n"
+                         "операцию: " + ", ".join(POLY_OPERATIONS) + "\n"
+                         "второй многочлен (для inv - модуль, для eval - точку)",
+                         parse_mode="html", reply_markup=hide_menu)
+    bot.register_next_step_handler(m, poly_output)
+
+
+@log_function_call("poly")
+def poly_output(message):
+    try:
+        ring, first, operation, second = [line.strip() for line in message.text.strip().splitlines()]
+        n = int(re.fullmatch(r"mod\s+(\d+)", ring).group(1))
+        operation = operation.lower()
+        if operation not in POLY_OPERATIONS:
+            raise ValueError
+        if not 2 <= n < Config.MAX_MODULO:
+            bot.send_message(message.chat.id, f"Ограничение: 2 <= n < {Config.MAX_MODULO:E}", reply_markup=menu)
+            return
+        a = Polynomial.parse(first, n, Config.POLY_MAX_DEGREE)
+        b = int(second) if operation == "eval" else Polynomial.parse(second, n, Config.POLY_MAX_DEGREE)
+    except PolynomialTooLarge:
+        bot.send_message(message.chat.id, f"Ограничение: степень не больше {Config.POLY_MAX_DEGREE}",
+                         reply_markup=menu)
+        return
+    except (AttributeError, ValueError):
+        bot.send_message(message.chat.id, "Ошибка ввода данных", reply_markup=menu)
+        return
+
+    def show(p):
+        return format_polynomial(p.coefficients[::-1])
+
+    try:
+        if operation == "+":
+            result = [show(a + b)]
+        elif operation == "-":
+            result = [show(a - b)]
+        elif operation == "*":
+            result = [show(a * b)]
+        elif operation == "/":
+            q, r = divmod(a, b)
+            result = ["Частное:", show(q), "Остаток:", show(r)]
+        elif operation == "gcd":
+            d, u, v = a.ext_gcd(b)
+            result = ["НОД:", show(d), "u (коэффициент первого):", show(u), "v (коэффициент второго):", show(v)]
+        elif operation == "inv":
+            if b.degree < 1:
+                bot.send_message(message.chat.id, "Модуль должен быть многочленом положительной степени",
+                                 reply_markup=menu)
+                return
+            result = [show(a.inverse(b))]
+        else:
+            result = [f"f({b % n}) = {a(b)}"]
+    except ZeroDivisionError:
+        bot.send_message(message.chat.id, "Деление на нулевой многочлен!", reply_markup=menu)
+        return
+    except ArithmeticError:
+        if operation == "inv":
+            answer = f"Многочлен <b>необратим</b> по данному модулю над Z/{n}"
+        else:
+            answer = f"Старший коэффициент делителя <b>необратим</b> в Z/{n} (выберите простой модуль)"
+        bot.send_message(message.chat.id, answer, parse_mode="html", reply_markup=menu)
+        return
+    # long polynomials are wrapped between terms
+    lines = [part for line in result for part in textwrap.wrap(line, MESSAGE_LENGTH // 2)]
+    return send_lines(message.chat.id, lines)
+
+
 @bot.message_handler(commands=["calc"])
 def calc_input(message):
-    m = bot.send_message(message.chat.id, "Введите выражение:", parse_mode="html")
-    bot.register_next_step_handler(m, calc_output)
+    ring = re.fullmatch(r"/\S+\s+mod\s+(\d+)", message.text.strip())  # /calc mod n: evaluation in Z/n
+    modulo = int(ring.group(1)) if ring else None
+    if modulo is not None and not 2 <= modulo <= Config.CALC_OPERAND_LIMIT:
+        bot.send_message(message.chat.id, f"Ограничение: 2 <= n <= {Config.CALC_OPERAND_LIMIT:E}", reply_markup=menu)
+        return
+    text = "Введите выражение:" if modulo is None else f"Введите выражение (вычисления в Z/{modulo}):"
+    m = bot.send_message(message.chat.id, text, parse_mode="html")
+    bot.register_next_step_handler(m, calc_output, modulo=modulo)
 
 
 @log_function_call("calc")
-def calc_output(message):
+def calc_output(message, modulo=None):
     try:
-        answer = str(safe_eval(message.text))
+        answer = str(safe_eval(message.text, modulo))
     except InvalidSyntax:
         bot.send_message(message.chat.id, "Синтаксическая ошибка в выражении", reply_markup=menu)
     except InvalidName:
@@ -396,7 +934,11 @@ def calc_output(message):
     except ZeroDivisionError:
         bot.send_message(message.chat.id, "Во время выполнения встречено деление на 0", reply_markup=menu)
     except ArithmeticError:
-        bot.send_message(message.chat.id, "Арифметическая ошибка", reply_markup=menu)
+        if modulo is not None:
+            bot.send_message(message.chat.id, f"Встречено деление на необратимый в Z/{modulo} элемент",
+                             reply_markup=menu)
+        else:
+            bot.send_message(message.chat.id, "Арифметическая ошибка", reply_markup=menu)
     except ValueError:
         bot.send_message(message.chat.id, "Не удалось распознать значение", reply_markup=menu)
     else: